@@ -0,0 +1,198 @@
+import numpy as np
+
+# Batch board encoding
+#
+#   boards:     (N, 9) int8, cell index row * 3 + col; 0 empty, 1 X, 2 O
+#   bitboards:  (N,) uint32, X cells in bits 0-8, O cells in bits 9-17
+EMPTY, X, O = 0, 1, 2
+CELL_VALUES = {" ": EMPTY, "X": X, "O": O}
+PLAYER_NAMES = (None, "X", "O")
+
+WIN_LINES = np.array([
+  (0, 1, 2), (3, 4, 5), (6, 7, 8),
+  (0, 3, 6), (1, 4, 7), (2, 5, 8),
+  (0, 4, 8), (2, 4, 6),
+], dtype=np.intp)
+
+def _symmetries():
+  """Cell permutations for the 8 rotations/reflections of the board"""
+  cells = np.arange(9).reshape(3, 3)
+  perms = []
+  for k in range(4):
+    rotated = np.rot90(cells, k)
+    perms.append(rotated.ravel())
+    perms.append(np.fliplr(rotated).ravel())
+  return np.array(perms, dtype=np.intp)
+
+SYMMETRIES = _symmetries()
+POW3 = 3 ** np.arange(8, -1, -1, dtype=np.int32)
+BIT = 1 << np.arange(9, dtype=np.uint32)
+
+def encode_boards(boards):
+  """Convert get_state style 3x3 boards of " "/"X"/"O" to an (N, 9) int8 array"""
+  return np.array(
+    [[CELL_VALUES[cell] for row in board for cell in row] for board in boards],
+    dtype=np.int8
+  ).reshape(-1, 9)
+
+def _flatten(games):
+  """Concatenate games into one move array: (cells, game index, move number, game lengths)"""
+  games = [bytes(cells) for cells in games]
+  lengths = np.fromiter((len(cells) for cells in games), dtype=np.intp, count=len(games))
+  flat = np.frombuffer(b"".join(games), dtype=np.uint8).astype(np.intp)
+  if len(flat) and flat.max() > 8:
+    raise ValueError("Cell indices must be 0-8")
+  game_idx = np.repeat(np.arange(len(games)), lengths)
+  starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+  move_no = np.arange(len(flat)) - starts
+  return flat, game_idx, move_no, lengths
+
+def boards_from_cells(games):
+  """
+  Build final boards from games given as cell index sequences
+
+  Args:
+      games: Iterable of move sequences (bytes or lists of row * 3 + col),
+             e.g. the cells from records.GameRecordReader.iter_raw()
+
+  Returns:
+      np.ndarray: (N, 9) int8 boards
+  """
+  flat, game_idx, move_no, lengths = _flatten(games)
+  boards = np.zeros((len(lengths), 9), dtype=np.int8)
+  boards[game_idx, flat] = X + move_no % 2
+  return boards
+
+def positions_from_cells(games):
+  """
+  Build the board after every move of every game
+
+  Args:
+      games: Iterable of move sequences (bytes or lists of row * 3 + col)
+
+  Returns:
+      tuple: ((M, 9) int8 boards, (M,) game index, (M,) ply starting at 1)
+  """
+  flat, game_idx, move_no, lengths = _flatten(games)
+
+  # Row j is the position after move j: mark each move on its own row, then
+  # take a running sum down each game's rows (a game's moves never share a cell)
+  marks = np.zeros((len(flat), 9), dtype=np.int32)
+  marks[np.arange(len(flat)), flat] = X + move_no % 2
+  totals = np.cumsum(marks, axis=0)
+  ends = np.cumsum(lengths)
+  before = np.zeros((len(lengths), 9), dtype=np.int32)
+  has_previous = (ends - lengths) > 0
+  before[has_previous] = totals[(ends - lengths)[has_previous] - 1]
+  boards = (totals - np.repeat(before, lengths, axis=0)).astype(np.int8)
+  return boards, game_idx, (move_no + 1).astype(np.int8)
+
+def pack_bitboards(boards):
+  """Pack (N, 9) boards into (N,) uint32 bitboards"""
+  boards = np.asarray(boards)
+  x_bits = (boards == X).astype(np.uint32) @ BIT
+  o_bits = (boards == O).astype(np.uint32) @ BIT
+  return x_bits | (o_bits << np.uint32(9))
+
+def unpack_bitboards(bitboards):
+  """Unpack (N,) bitboards into (N, 9) int8 boards"""
+  bitboards = np.asarray(bitboards, dtype=np.uint32).reshape(-1, 1)
+  x_cells = (bitboards & BIT) != 0
+  o_cells = ((bitboards >> np.uint32(9)) & BIT) != 0
+  return (x_cells * X + o_cells * O).astype(np.int8)
+
+def as_boards(boards):
+  """
+  Accept either (N, 9) boards or (N,) bitboards and return (N, 9) int8 boards
+
+  A 1-D integer input is read as bitboards. A 1-D input of exactly 9 values
+  could be either, so it must be a uint32 array (bitboards) or be reshaped
+  to (1, 9) (one board).
+
+  Raises:
+      ValueError: For other shapes, non-integer input, or values that are
+                  not valid cells or bitboards
+  """
+  boards = np.asarray(boards)
+  if boards.dtype.kind not in "iu" and boards.size:
+    raise ValueError(f"Boards must be integers, got {boards.dtype}")
+  if boards.ndim == 1:
+    if len(boards) == 9 and boards.dtype != np.uint32:
+      raise ValueError("Ambiguous 1-D input of length 9: pass one board as shape (1, 9) or bitboards as uint32")
+    bits = boards.astype(np.int64)
+    if ((bits < 0) | (bits >= 1 << 18)).any():
+      raise ValueError("Bitboards must fit in 18 bits")
+    if ((bits & (bits >> 9) & 0x1FF) != 0).any():
+      raise ValueError("Bitboards must not mark a cell for both X and O")
+    return unpack_bitboards(bits)
+  if boards.ndim != 2 or boards.shape[1] != 9:
+    raise ValueError(f"Boards must have shape (N, 9) or (N,), got {boards.shape}")
+  if ((boards < EMPTY) | (boards > O)).any():
+    raise ValueError("Board cells must be 0 (empty), 1 (X) or 2 (O)")
+  return boards.astype(np.int8, copy=False)
+
+def check_winner(boards):
+  """Vectorized TicTacToe.check_winner: (N,) int8 of 0 none, 1 X, 2 O"""
+  lines = as_boards(boards)[:, WIN_LINES]
+  x_wins = (lines == X).all(axis=2).any(axis=1)
+  o_wins = (lines == O).all(axis=2).any(axis=1)
+  return np.where(x_wins, X, np.where(o_wins, O, EMPTY)).astype(np.int8)
+
+def check_draw(boards):
+  """Vectorized TicTacToe.check_draw: True where the board is full"""
+  return (as_boards(boards) != EMPTY).all(axis=1)
+
+def current_player(boards):
+  """Player to move for each board: (N,) int8 of 1 X or 2 O"""
+  boards = as_boards(boards)
+  x_count = (boards == X).sum(axis=1)
+  o_count = (boards == O).sum(axis=1)
+  return np.where(x_count > o_count, O, X).astype(np.int8)
+
+def canonical(boards):
+  """
+  Reduce each board to its symmetry-canonical form
+
+  The canonical form is the rotation/reflection with the smallest base-3
+  key, so all 8 symmetric variants of a position share one key.
+
+  Returns:
+      tuple: (canonical (N, 9) int8 boards, (N,) int32 keys, (N,) symmetry index)
+  """
+  boards = as_boards(boards)
+  keys = np.empty((len(boards), len(SYMMETRIES)), dtype=np.int32)
+  for s, perm in enumerate(SYMMETRIES):
+    keys[:, s] = boards[:, perm].astype(np.int32) @ POW3
+  symmetry = keys.argmin(axis=1)
+  rows = np.arange(len(boards))
+  return boards[rows[:, None], SYMMETRIES[symmetry]], keys[rows, symmetry], symmetry
+
+def evaluate(boards):
+  """
+  Evaluate a batch of boards in one vectorized pass
+
+  Args:
+      boards: (N, 9) int8 boards or (N,) integer bitboards (see as_boards)
+
+  Returns:
+      dict: Arrays keyed like get_state, plus analysis fields
+        - winner:          (N,) int8, 0 none, 1 X, 2 O
+        - game_over:       (N,) bool
+        - current_player:  (N,) int8, 1 X, 2 O
+        - legal_moves:     (N, 9) bool, all False once the game is over
+        - canonical:       (N, 9) int8 symmetry-canonical boards
+        - canonical_key:   (N,) int32 base-3 key of the canonical board
+  """
+  boards = as_boards(boards)
+  winner = check_winner(boards)
+  empty = boards == EMPTY
+  game_over = (winner != EMPTY) | ~empty.any(axis=1)
+  canonical_boards, keys, _ = canonical(boards)
+  return {
+    "winner": winner,
+    "game_over": game_over,
+    "current_player": current_player(boards),
+    "legal_moves": empty & ~game_over[:, None],
+    "canonical": canonical_boards,
+    "canonical_key": keys
+  }
@@ -9,6 +9,7 @@ from utils import extract_result_text
 ANTHROPIC_MODEL = "claude-3-5-sonnet-latest"
 HUMAN_PLAYS = "X" 
 AI_PLAYS = "O"
+POSITION_INDEX = os.getenv("POSITION_INDEX")  # Optional position_index.py database
 
 class Game:
   def __init__(self):
@@ -18,9 +19,17 @@ class Game:
     self.current_player = HUMAN_PLAYS
     self.game_history = []  # Store conversation history
     self.game_state = None
+    self.position_index = None
+    if POSITION_INDEX:
+      from position_index import PositionIndex
+      self.position_index = PositionIndex(POSITION_INDEX)
       
   async def load_game_state(self):
-    """Load the game state"""
+    """Load the game state, from the server's pushed updates when subscribed"""
+    pushed = self.mcp_client.latest_state()
+    if pushed is not None:
+      self.game_state = pushed
+      return
     state = await self.mcp_client.get_state()
     try:
       self.game_state = json.loads(state)
@@ -32,6 +41,7 @@ class Game:
     """Start a new game session"""
     await self.mcp_client.start()
     await self.mcp_client.reset_game()
+    await self.mcp_client.subscribe()
     await self.load_game_state()
 
   async def reset_game(self):
@@ -221,6 +231,10 @@ class Game:
       for i, (player, row, col) in enumerate(self.game_history[-5:]):  # Last 5 moves
           prompt += f"{i+1}. {player} played at ({row},{col})\n"
     
+    # Add results of past games from each candidate move
+    if current_player == AI_PLAYS and self.position_index:
+      prompt += self.format_move_stats()
+
     # Add strategy context based on game state
     if current_player == AI_PLAYS:
       prompt += f"""
@@ -246,6 +260,39 @@ class Game:
     
     return prompt
   
+  def format_move_stats(self):
+    """
+    Summarize how archived games went after each legal move for the AI
+
+    Returns:
+        str: Prompt section, or "" if no move has been seen before
+    """
+    win_column = "x_wins" if AI_PLAYS == "X" else "o_wins"
+    loss_column = "o_wins" if AI_PLAYS == "X" else "x_wins"
+    lines = []
+    for (row, col), stats in self.position_index.move_stats(self.game_state['board'], AI_PLAYS).items():
+      if stats["games"]:
+        lines.append(
+          f"({row},{col}): {stats['games']} games, "
+          f"won {stats[win_column] / stats['games']:.0%}, "
+          f"lost {stats[loss_column] / stats['games']:.0%}, "
+          f"drew {stats['draws'] / stats['games']:.0%}\n"
+        )
+    if not lines:
+      return ""
+    return "\nRESULTS OF PAST GAMES AFTER EACH MOVE (rotations/reflections included):\n" + "".join(lines)
+
+  def record_game(self):
+    """Add the finished game to the position index"""
+    if not self.position_index or not self.game_history:
+      return
+    from records import replay
+    cells = [row * 3 + col for _, row, col in self.game_history]
+    try:
+      self.position_index.add_games([(replay(cells), cells)], source="chat")
+    except ValueError as e:
+      print(f"⚠️ Could not index game: {e}")
+
   def parse_ai_response(self, response_text):
     """
     Parse Claude's response to extract move coordinates
@@ -342,6 +389,8 @@ class Game:
           else:
             print("⚠️ Invalid move, try again.")
         game_over = await self.check_game_over()
+
+      self.record_game()
   
     except Exception as e:
         print(f"❌ Error during game loop: {e}")
@@ -355,6 +404,8 @@ class Game:
       if self.mcp_client:
         await self.mcp_client.close()
         print("🔌 MCP client connection closed.")
+      if self.position_index:
+        self.position_index.close()
     except Exception as e:
         print(f"⚠️ Error during cleanup: {e}")
     finally:
@@ -6,30 +6,72 @@ ANTHROPIC_MODEL = "claude-3-5-sonnet-latest"
 HUMAN_PLAYS = "X"
 MODEL_PLAYS = "O" if HUMAN_PLAYS == "X" else "X"
 
-import asyncio, os
-from mcp import StdioServerParameters, stdio_client, ClientSession
+import asyncio, itertools, os, uuid
+from collections import defaultdict
+from mcp import StdioServerParameters, stdio_client, ClientSession, types
+from pydantic import AnyUrl
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
 
 MCP_SERVER_CMD = "uv"
 MCP_SERVER_ARGS = ["run", "python", "main.py", "--mcp"]
+MCP_WORKER_ARGS = [*MCP_SERVER_ARGS, "--worker"]  # Private servers owned by a router or pool
+DEFAULT_GAME_ID = "default"
+UPDATES_ENDED = object()  # Queued to updates() iterators when no more pushes will come
 
 anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
+def expand_state(compact):
+  """Turn a compact state from a game notification back into get_state shape"""
+  board = compact["board"]
+  return {
+    "board": [list(board[i:i + 3]) for i in range(0, 9, 3)],
+    "current_player": compact["current_player"],
+    "winner": compact["winner"],
+    "game_over": compact["game_over"]
+  }
+
 class MCPClient:
-  def __init__(self, command=MCP_SERVER_CMD, args=MCP_SERVER_ARGS):
+  def __init__(self, command=MCP_SERVER_CMD, args=MCP_SERVER_ARGS, url=None, game_id=DEFAULT_GAME_ID):
+    """
+    Connect to a Tic-Tac-Toe MCP server
+
+    Args:
+        command, args: Command to spawn a private stdio server
+        url: URL of a shared server started with --transport streamable-http
+             (e.g. http://127.0.0.1:8000/mcp) or sse (.../sse); overrides command
+        game_id: Game this client plays on the server
+    """
     self.server_params = StdioServerParameters(
       command=command, 
       args=args, 
       env={**os.environ, "PYTHONUNBUFFERED": "0", "MCP_LOG_LEVEL": "ERROR"})
+    self.url = url
+    self.game_id = game_id
     self._ctx = None
     self.session = None
+    # Pushed game states, shared with clients from bind(): uri -> latest state
+    self.states = {}
+    self._listeners = defaultdict(list)
+
+  @property
+  def game_uri(self):
+    return f"game://{self.game_id}"
+
+  def _transport(self):
+    if not self.url:
+      return stdio_client(self.server_params)
+    if self.url.rstrip("/").endswith("/sse"):
+      return sse_client(self.url)
+    return streamablehttp_client(self.url)
 
   async def start(self):
     try: 
       # Store context managers for later cleanup
-      self._ctx = stdio_client(self.server_params)
-      read, write = await self._ctx.__aenter__()
+      self._ctx = self._transport()
+      read, write, *_ = await self._ctx.__aenter__()
       
-      self.session = ClientSession(read, write) 
+      self.session = ClientSession(read, write, message_handler=self._handle_message)
       await self.session.__aenter__()
       
       await self.session.initialize()
@@ -57,14 +99,125 @@ class MCPClient:
       return None
     try:
       result = await self.session.call_tool(name=tool_name, arguments=args or {})
+      if result.isError:
+        # e.g. play_move off the board; callers treat None as a failed call
+        print(f"Error calling tool: {extract_result_text(result.content)}")
+        return None
       return result
     except Exception as e:
       print(f"Error calling tool: {e}")
       return None
+
+  async def call_tools(self, calls):
+    """Send several (tool_name, args) calls concurrently over the one session"""
+    return await asyncio.gather(*(self.call_tool(name, args) for name, args in calls))
+
+  def bind(self, game_id):
+    """Return a client for another game that shares this client's session"""
+    client = MCPClient(url=self.url, game_id=game_id)
+    client.server_params = self.server_params
+    client.session = self.session
+    client.states = self.states
+    client._listeners = self._listeners
+    return client
+
+  async def _handle_message(self, message):
+    """Record pushed game states; runs in the session's receive loop, so never awaits the server"""
+    if not isinstance(message, types.ServerNotification):
+      return
+    notification = message.root
+    if not isinstance(notification, types.ResourceUpdatedNotification):
+      return
+    uri = str(notification.params.uri)
+    extra = notification.params.model_extra or {}
+    if extra.get("subscribed") is False:
+      # The server dropped this subscription (e.g. we fell too far behind)
+      self._end_updates(uri)
+      return
+    compact = extra.get("state")
+    state = expand_state(compact) if compact else None
+    if uri in self.states:
+      self.states[uri] = state
+    for queue in self._listeners.get(uri, ()):
+      queue.put_nowait(state)
+
+  def _end_updates(self, uri):
+    """Forget a game's pushed state and end its updates() iterators"""
+    self.states.pop(uri, None)
+    for queue in self._listeners.pop(uri, ()):
+      queue.put_nowait(UPDATES_ENDED)
+
+  async def read_state(self):
+    """Read this client's game through its game://<game_id> resource"""
+    result = await self.session.read_resource(AnyUrl(self.game_uri))
+    return json.loads(result.contents[0].text)
+
+  async def subscribe(self):
+    """Ask the server to push this client's game state whenever it changes"""
+    if not self.session:
+      print("No session found")
+      return False
+    try:
+      await self.session.subscribe_resource(AnyUrl(self.game_uri))
+      self.states[self.game_uri] = await self.read_state()
+      return True
+    except Exception as e:
+      print(f"Error subscribing to game: {e}")
+      return False
+
+  async def unsubscribe(self):
+    """Stop the server pushing this client's game and forget its pushed state"""
+    self._end_updates(self.game_uri)
+    if not self.session:
+      print("No session found")
+      return False
+    try:
+      await self.session.unsubscribe_resource(AnyUrl(self.game_uri))
+      return True
+    except Exception as e:
+      print(f"Error unsubscribing from game: {e}")
+      return False
+
+  def latest_state(self):
+    """Last pushed state of this client's game, or None if not subscribed (use get_state then)"""
+    return self.states.get(self.game_uri)
+
+  async def updates(self):
+    """
+    Async iterator over this client's game state, yielding each pushed change
+
+    The iterator ends when the client unsubscribes or closes, or when the
+    server drops the subscription.
+
+    Example:
+        async for state in client.updates():
+          print(state["board"])
+
+    Raises:
+        RuntimeError: If the client is not subscribed and subscribing fails
+    """
+    if self.game_uri not in self.states and not await self.subscribe():
+      raise RuntimeError(f"Could not subscribe to {self.game_uri}")
+    queue = asyncio.Queue()
+    listeners = self._listeners[self.game_uri]
+    listeners.append(queue)
+    try:
+      while True:
+        state = await queue.get()
+        if state is UPDATES_ENDED:
+          return
+        yield state if state is not None else await self.read_state()
+    finally:
+      if queue in listeners:
+        listeners.remove(queue)
   
   async def close(self):
+    # Clients from bind() share a session they do not own; only the owner closes it
+    if self._ctx:
+      for uri in set(self.states) | set(self._listeners):
+        self._end_updates(uri)
     try:
-      if self.session:
+      if self._ctx and self.session:
         await self.session.__aexit__(None, None, None)
       if self._ctx:
         await self._ctx.__aexit__(None, None, None)
@@ -75,20 +228,243 @@ class MCPClient:
    # Game-specific convenience methods (now async)
   async def play_move(self, row, col):
     """Make a move on the board"""
-    result = await self.call_tool("play_move", {"input": {"row": row, "col": col}})
+    result = await self.call_tool("play_move", {"input": {"row": row, "col": col}, "game_id": self.game_id})
     return result.content if result else None
   
   async def show_board(self):
     """Get board display"""
-    result = await self.call_tool("show_board", {})
+    result = await self.call_tool("show_board", {"game_id": self.game_id})
     return extract_result_text(result.content) if result else None
   
   async def get_state(self):
     """Get game state"""
-    result = await self.call_tool("get_state", {})
+    result = await self.call_tool("get_state", {"game_id": self.game_id})
     return extract_result_text(result.content) if result else None
 
   async def reset_game(self):
     """Reset the game"""
-    result = await self.call_tool("reset_game", {})
+    result = await self.call_tool("reset_game", {"game_id": self.game_id})
     return extract_result_text(result.content) if result else None
+
+class BackgroundClient(MCPClient):
+  """
+  MCPClient whose connection is opened and closed inside a dedicated task
+
+  The stdio/HTTP transports must be exited from the task that entered them.
+  Long-lived clients that are started and stopped from different requests
+  (pools, routers) use this so start() and close() can be called anywhere.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._ready = asyncio.Event()
+    self._stop = asyncio.Event()
+    self._task = None
+    self.connected = False
+
+  async def _run(self):
+    self.connected = await super().start()
+    self._ready.set()
+    await self._stop.wait()
+    await super().close()
+
+  async def start(self):
+    self._task = asyncio.create_task(self._run())
+    await self._ready.wait()
+    return self.connected
+
+  async def close(self):
+    self._stop.set()
+    if self._task:
+      await self._task
+      self._task = None
+
+  async def ping(self, timeout=5):
+    """Check the server still answers"""
+    try:
+      await asyncio.wait_for(self.session.send_ping(), timeout)
+      return True
+    except Exception:
+      return False
+
+class ClientPool:
+  """
+  Keep warm MCP server connections ready and hand out games on them
+
+  Each pooled server hosts many games (keyed by game_id), and the clients
+  handed out share its session, so calls from different games are pipelined
+  concurrently instead of each game paying for a new subprocess and handshake.
+  Servers are health-checked in the background and recycled after serving
+  max_games games.
+  """
+
+  def __init__(self, size=2, max_size=8, games_per_client=32, max_games=1000,
+               health_interval=30, command=MCP_SERVER_CMD, args=MCP_WORKER_ARGS, url=None):
+    self.size = size
+    self.max_size = max_size
+    self.games_per_client = games_per_client
+    self.max_games = max_games
+    self.health_interval = health_interval
+    self.command = command
+    self.args = args
+    self.url = url
+    self.clients = []
+    self.active = {}   # client -> number of games currently handed out
+    self.served = {}   # client -> number of games handed out in total
+    self._starting = 0  # spawns in progress, counted against max_size
+    # Guards the bookkeeping above; spawning, pinging and closing servers
+    # happen outside it so a slow server never blocks acquire/release
+    self._lock = asyncio.Lock()
+    self._changed = asyncio.Condition(self._lock)
+    self._tasks = set()
+    self._health_task = None
+    self._names = itertools.count()
+
+  def _exhausted(self, client):
+    return self.served[client] >= self.max_games
+
+  def _reserve(self, count=1, limit=None):
+    """Reserve up to count spawns without passing limit (max_size); call under the lock"""
+    count = max(0, min(count, (limit or self.max_size) - len(self.clients) - self._starting))
+    self._starting += count
+    return count
+
+  def _remove(self, client):
+    """Stop handing out a client; call under the lock and close it afterwards"""
+    self.clients.remove(client)
+    self.active.pop(client, None)
+    self.served.pop(client, None)
+
+  async def _spawn(self):
+    """Start a reserved server outside the lock, then add it to the pool"""
+    client = BackgroundClient(command=self.command, args=self.args, url=self.url,
+                              game_id=f"pool-{next(self._names)}")
+    connected = False
+    try:
+      connected = await client.start()
+    finally:
+      # Also runs if the spawn is cancelled, so neither the reservation nor
+      # the server process is leaked
+      if not connected:
+        await client.close()
+      async with self._changed:
+        self._starting -= 1
+        if connected:
+          self.clients.append(client)
+          self.active[client] = 0
+          self.served[client] = 0
+        self._changed.notify_all()
+    return client if connected else None
+
+  async def _replace(self, client, spawn):
+    """Close a removed server and start its reserved replacement"""
+    await client.close()
+    if spawn:
+      await self._spawn()
+
+  def _later(self, coro):
+    """Run pool upkeep in the background, keeping a reference to the task"""
+    task = asyncio.create_task(coro)
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return task
+
+  async def start(self):
+    """Start the warm connections; returns how many came up"""
+    async with self._lock:
+      count = self._reserve(self.size, limit=self.size)
+    await asyncio.gather(*(self._spawn() for _ in range(count)))
+    if self._health_task is None:
+      self._health_task = asyncio.create_task(self._health_loop())
+    return len(self.clients)
+
+  async def acquire(self, game_id=None):
+    """
+    Hand out a client for a new game
+
+    Servers that have served max_games games are never handed out again.
+    If every usable server is full, the least busy one is oversubscribed
+    while another server is spawned in the background.
+
+    Args:
+        game_id: Game to play; a unique id is generated if omitted
+
+    Returns:
+        MCPClient: Client bound to game_id on a warm server
+    """
+    while True:
+      async with self._changed:
+        usable = [c for c in self.clients if not self._exhausted(c)]
+        open_clients = [c for c in usable if self.active[c] < self.games_per_client]
+        client = min(open_clients or usable, key=self.active.get, default=None)
+        if client is not None:
+          if not open_clients and self._reserve():
+            self._later(self._spawn())
+          self.active[client] += 1
+          self.served[client] += 1
+          return client.bind(game_id or uuid.uuid4().hex)
+        spawn = self._reserve()
+        if not spawn:
+          if not self.clients and not self._starting:
+            raise RuntimeError("No MCP servers available in pool")
+          # Every server is being spawned or drained; wait for one to change
+          await self._changed.wait()
+          continue
+      if await self._spawn() is None:
+        raise RuntimeError("No MCP servers available in pool")
+
+  async def release(self, game):
+    """Return a game's client to the pool and free the game on the server"""
+    if game.game_uri in game.states:
+      await game.unsubscribe()
+    # The pushed-state maps are shared by every game on the server
+    game._end_updates(game.game_uri)
+    if not self.url:
+      # Only servers the pool spawned itself run with --worker and have drop_game
+      await game.call_tool("drop_game", {"game_id": game.game_id})
+    async with self._changed:
+      owner = next((c for c in self.clients if c.session is game.session), None)
+      if owner is None:
+        return
+      self.active[owner] -= 1
+      if self.active[owner] == 0 and self._exhausted(owner):
+        self._remove(owner)
+        # Replace it in the background so the caller does not wait for a spawn
+        self._later(self._replace(owner, self._reserve()))
+      self._changed.notify_all()
+
+  async def check_health(self):
+    """Ping every server, busy or idle, replacing any that stopped answering"""
+    async with self._lock:
+      clients = list(self.clients)
+    alive = await asyncio.gather(*(client.ping() for client in clients))
+    async with self._changed:
+      dead = [c for c, ok in zip(clients, alive) if not ok and c in self.active]
+      for client in dead:
+        print(f"⚠️ Replacing unresponsive MCP server {client.game_id}")
+        self._remove(client)
+      spawn = self._reserve(self.size, limit=self.size)
+      self._changed.notify_all()
+    spawns = [self._later(self._spawn()) for _ in range(spawn)]
+    for client in dead:
+      await client.close()
+    await asyncio.gather(*spawns)
+
+  async def _health_loop(self):
+    while True:
+      await asyncio.sleep(self.health_interval)
+      await self.check_health()
+
+  async def close(self):
+    if self._health_task:
+      self._health_task.cancel()
+      await asyncio.gather(self._health_task, return_exceptions=True)
+      self._health_task = None
+    while self._tasks:
+      await asyncio.gather(*self._tasks, return_exceptions=True)
+    async with self._lock:
+      clients = list(self.clients)
+      for client in clients:
+        self._remove(client)
+    for client in clients:
+      await client.close()
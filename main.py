@@ -1,11 +1,16 @@
 from mcp.server.fastmcp import FastMCP
-from pydantic import BaseModel
-import logging, os
+from mcp import types
+from pydantic import AnyUrl, BaseModel
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import asyncio, json, logging, os, time, weakref
 
 logging.getLogger("mcp.server.fastmcp").setLevel(logging.CRITICAL)
 logging.getLogger("mcp").setLevel(logging.CRITICAL) 
 logging.getLogger("fastmcp").setLevel(logging.CRITICAL)
 os.environ["PYTHONUNBUFFERED"] = "0"
+# stdout is the JSON-RPC channel under stdio; warnings go to stderr via logging
+logger = logging.getLogger("tic-tac-toe")
 
 class TicTacToe:
   def __init__(self):
@@ -60,12 +65,30 @@ class TicTacToe:
   
   def get_state(self):
     return {
-      "board": self.board,
+      "board": [row[:] for row in self.board],
       "current_player": self.current_player,
       "winner": self.winner,
       "game_over": self.game_over
     }
   
+  def load_state(self, state):
+    board = state["board"]
+    if len(board) != 3 or any(len(row) != 3 for row in board):
+      raise ValueError("Board must be 3x3")
+    if any(cell not in (" ", "X", "O") for row in board for cell in row):
+      raise ValueError("Board cells must be ' ', 'X' or 'O'")
+    x_count = sum(row.count("X") for row in board)
+    o_count = sum(row.count("O") for row in board)
+    if x_count - o_count not in (0, 1):
+      raise ValueError("X moves first, so X must have as many marks as O or one more")
+    if state["current_player"] != ("X" if x_count == o_count else "O"):
+      raise ValueError("current_player does not match the board")
+    self.board = [row[:] for row in board]
+    self.current_player = state["current_player"]
+    self.winner = self.check_winner()
+    self.game_over = self.is_game_over()
+    return self.get_state()
+
   def play_move(self, row, col):
     if self.board[row][col] != " ":
       return None
@@ -79,25 +102,283 @@ class PlayMoveInput(BaseModel):
   row: int
   col: int
 
+class GameStateInput(BaseModel):
+  board: list[list[str]]
+  current_player: str
+
+DEFAULT_GAME_ID = "default"
+FINISHED_GAME_TTL = 10 * 60  # Seconds a finished game is kept after its last call
+IDLE_GAME_TTL = 60 * 60      # Seconds an unfinished game is kept after its last call
+EVICT_INTERVAL = 60          # Seconds between sweeps for expired games
+
 # Create an MCP server
 mcp = FastMCP("Tic-Tac-Toe")
-ttt = TicTacToe()
+
+# Games are keyed by id so one server (e.g. over HTTP) can host many players.
+# Each game has its own lock so concurrent calls on it are applied in order.
+# Finished and idle games are evicted, and a lock is dropped once its game is
+# gone and no call is using it, so a long-running server does not grow.
+games = {}
+game_locks = {}
+lock_users = {}
+last_used = {}
+last_eviction = 0.0
+
+def get_game(game_id=DEFAULT_GAME_ID):
+  """Get the game with this id, creating it on first use"""
+  if game_id not in games:
+    evict_idle_games()
+    games[game_id] = TicTacToe()
+  last_used[game_id] = time.monotonic()
+  return games[game_id]
+
+def peek_game(game_id=DEFAULT_GAME_ID):
+  """Get the game with this id for reading; an unknown id reads as a new game without creating it"""
+  if game_id not in games:
+    return TicTacToe()
+  last_used[game_id] = time.monotonic()
+  return games[game_id]
+
+def forget_game(game_id):
+  """Remove a game; returns whether it existed"""
+  last_used.pop(game_id, None)
+  existed = games.pop(game_id, None) is not None
+  if game_id not in lock_users:
+    game_locks.pop(game_id, None)
+  return existed
+
+def evict_idle_games(force=False):
+  """Forget games nobody has used for a while; returns how many were evicted"""
+  global last_eviction
+  now = time.monotonic()
+  if not force and now - last_eviction < EVICT_INTERVAL:
+    return 0
+  last_eviction = now
+  expired = [
+    game_id for game_id, used in last_used.items()
+    if game_id not in lock_users
+    and now - used > (FINISHED_GAME_TTL if games[game_id].game_over else IDLE_GAME_TTL)
+  ]
+  for game_id in expired:
+    forget_game(game_id)
+  return len(expired)
+
+@asynccontextmanager
+async def game_lock(game_id):
+  """Hold a game's lock for the duration of one call"""
+  lock = game_locks.setdefault(game_id, asyncio.Lock())
+  lock_users[game_id] = lock_users.get(game_id, 0) + 1
+  try:
+    async with lock:
+      yield
+  finally:
+    lock_users[game_id] -= 1
+    if not lock_users[game_id]:
+      del lock_users[game_id]
+      if game_id not in games:
+        game_locks.pop(game_id, None)
+
+# Each game is also the resource game://<game_id>. Sessions that subscribe to
+# it are pushed a resources/updated notification whenever the game changes.
+# Notifications are queued per session and sent by that session's own task,
+# so a slow or dead subscriber never holds up a game lock. A session's
+# subscriptions are dropped when it closes, when a send to it fails, or
+# (after telling it) when it falls OUTBOX_SIZE updates behind.
+OUTBOX_SIZE = 100  # Unsent notifications a session may fall behind before it is dropped
+
+subscriptions = defaultdict(set)  # uri -> subscribed sessions
+session_uris = defaultdict(set)   # session -> uris it is subscribed to
+outboxes = {}                     # session -> (notification queue, sender task)
+closing_hooks = weakref.WeakSet() # sessions whose close already drops their subscriptions
+farewells = set()                 # tasks telling dropped sessions they were unsubscribed
+
+def game_uri(game_id):
+  return f"game://{game_id}"
+
+def compact_state(state):
+  """Shrink a get_state dict for notifications: the board becomes a 9 character string"""
+  return {
+    "board": "".join(cell for row in state["board"] for cell in row),
+    "current_player": state["current_player"],
+    "winner": state["winner"],
+    "game_over": state["game_over"]
+  }
+
+async def send_notifications(session, queue):
+  """Deliver one session's notifications in order"""
+  while True:
+    notification = await queue.get()
+    try:
+      await session.send_notification(notification)
+    except Exception:
+      # The subscriber has disconnected
+      drop_session(session)
+      return
+    finally:
+      queue.task_done()
+
+async def send_unsubscribed(session, uris):
+  """Tell a dropped session it will get no more updates for uris"""
+  for uri in uris:
+    try:
+      await session.send_notification(types.ServerNotification(types.ResourceUpdatedNotification(
+        params=types.ResourceUpdatedNotificationParams(uri=AnyUrl(uri), subscribed=False)
+      )))
+    except Exception:
+      return
+
+async def session_closed(session):
+  drop_session(session)
+
+def subscribe_session(uri, session):
+  subscriptions[uri].add(session)
+  session_uris[session].add(uri)
+  if session not in outboxes:
+    queue = asyncio.Queue(OUTBOX_SIZE)
+    outboxes[session] = (queue, asyncio.create_task(send_notifications(session, queue)))
+  if session not in closing_hooks:
+    # Runs when the session ends, e.g. a client that disconnects without unsubscribing
+    session._exit_stack.push_async_callback(session_closed, session)
+    closing_hooks.add(session)
+
+def unsubscribe_session(uri, session):
+  """Remove one subscription, stopping the session's sender once it has none left"""
+  sessions = subscriptions.get(uri)
+  if sessions is not None:
+    sessions.discard(session)
+    if not sessions:
+      del subscriptions[uri]
+  uris = session_uris.get(session)
+  if uris is not None:
+    uris.discard(uri)
+    if uris:
+      return
+    del session_uris[session]
+  queue, task = outboxes.pop(session, (None, None))
+  if task is None:
+    return
+  if task is not asyncio.current_task():
+    task.cancel()
+  # Release anyone in flush_notifications waiting on this session
+  while not queue.empty():
+    queue.get_nowait()
+    queue.task_done()
+
+def drop_session(session, tell=False):
+  """Forget every subscription of a session; with tell, let it know it was unsubscribed"""
+  uris = list(session_uris.get(session, ()))
+  for uri in uris:
+    unsubscribe_session(uri, session)
+  if tell and uris:
+    task = asyncio.create_task(send_unsubscribed(session, uris))
+    farewells.add(task)
+    task.add_done_callback(farewells.discard)
+
+def notify_game_changed(game_id):
+  """Queue the game's new state for every session subscribed to it; never waits on a session"""
+  uri = game_uri(game_id)
+  sessions = subscriptions.get(uri)
+  if not sessions:
+    return
+  notification = types.ServerNotification(types.ResourceUpdatedNotification(
+    params=types.ResourceUpdatedNotificationParams(
+      uri=AnyUrl(uri), state=compact_state(get_game(game_id).get_state()))
+  ))
+  for session in list(sessions):
+    try:
+      outboxes[session][0].put_nowait(notification)
+    except asyncio.QueueFull:
+      logger.warning("Dropping subscriber that fell %d updates behind", OUTBOX_SIZE)
+      drop_session(session, tell=True)
+
+async def flush_notifications():
+  """Wait, outside the game lock, until the calling session has been sent its queued updates"""
+  try:
+    session = mcp.get_context().session
+  except ValueError:
+    return  # Called directly rather than through an MCP request
+  outbox = outboxes.get(session)
+  if outbox is not None:
+    await outbox[0].join()
+
+@mcp.resource("game://{game_id}", mime_type="application/json")
+async def game_resource(game_id: str) -> str:
+  """Current state of a game, as returned by get_state"""
+  async with game_lock(game_id):
+    return json.dumps(peek_game(game_id).get_state())
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_game(uri: AnyUrl):
+  subscribe_session(str(uri), mcp.get_context().session)
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_game(uri: AnyUrl):
+  unsubscribe_session(str(uri), mcp.get_context().session)
+
+# FastMCP always advertises subscribe=False; we do support it
+_get_capabilities = mcp._mcp_server.get_capabilities
+
+def get_capabilities(*args, **kwargs):
+  capabilities = _get_capabilities(*args, **kwargs)
+  capabilities.resources.subscribe = True
+  return capabilities
+
+mcp._mcp_server.get_capabilities = get_capabilities
 
 @mcp.tool("reset_game")
-def reset_game():
-  return ttt.reset_game()
+async def reset_game(game_id: str = DEFAULT_GAME_ID):
+  async with game_lock(game_id):
+    state = get_game(game_id).reset_game()
+    notify_game_changed(game_id)
+  await flush_notifications()
+  return state
 
 @mcp.tool("show_board")
-def show_board():
-  return ttt.show_board()
+async def show_board(game_id: str = DEFAULT_GAME_ID):
+  async with game_lock(game_id):
+    return peek_game(game_id).show_board()
 
 @mcp.tool("get_state")
-def get_state():
-  return ttt.get_state()
+async def get_state(game_id: str = DEFAULT_GAME_ID):
+  async with game_lock(game_id):
+    return peek_game(game_id).get_state()
 
 @mcp.tool("play_move")
-def play_move(input: PlayMoveInput):
-  return ttt.play_move(input.row, input.col)
+async def play_move(input: PlayMoveInput, game_id: str = DEFAULT_GAME_ID):
+  async with game_lock(game_id):
+    state = get_game(game_id).play_move(input.row, input.col)
+    if state is not None:
+      notify_game_changed(game_id)
+  await flush_notifications()
+  return state
+
+# Worker tools: only registered with --worker, for a router or pool that owns this
+# process. They would let any client of a shared server overwrite or delete
+# other players' games.
+async def load_game(state: GameStateInput, game_id: str = DEFAULT_GAME_ID):
+  """Replace a game's state, e.g. when a router moves the game between workers"""
+  async with game_lock(game_id):
+    loaded = get_game(game_id).load_state(state.model_dump())
+    notify_game_changed(game_id)
+  await flush_notifications()
+  return loaded
+
+async def export_game(game_id: str):
+  """A game's state for moving it to another worker; state is null if this worker no longer has it"""
+  async with game_lock(game_id):
+    game = games.get(game_id)
+    return {"state": game.get_state() if game is not None else None}
+
+async def drop_game(game_id: str):
+  """Forget a game that now lives on another worker"""
+  async with game_lock(game_id):
+    return forget_game(game_id)
+
+def enable_worker_tools():
+  """Expose export_game/load_game/drop_game so a router or pool can move and free games"""
+  mcp.add_tool(export_game, name="export_game")
+  mcp.add_tool(load_game, name="load_game")
+  mcp.add_tool(drop_game, name="drop_game")
 
 @mcp.prompt()
 def greet_user(name: str, style: str = "friendly") -> str:
@@ -120,16 +401,17 @@ def handle_json_request():
     input_data = json.loads(sys.stdin.read())
     tool_name = input_data.get("tool")
     args = input_data.get("args", {})
+    game = get_game(args.get("game_id", DEFAULT_GAME_ID))
     
     # Route to appropriate function
     if tool_name == "play_move":
-      result = ttt.play_move(args["row"], args["col"])
+      result = game.play_move(args["row"], args["col"])
     elif tool_name == "show_board":
-      result = ttt.show_board()
+      result = game.show_board()
     elif tool_name == "get_state":
-      result = ttt.get_state()
+      result = game.get_state()
     elif tool_name == "reset_game":
-      result = ttt.reset_game()
+      result = game.reset_game()
     elif tool_name == "greet_user":
       result = greet_user(args.get("name", "User"), args.get("style", "friendly"))
     else:
@@ -150,8 +432,29 @@ if __name__ == "__main__":
   
   # Check if we're running as MCP server or JSON CLI
   if len(sys.argv) > 1 and sys.argv[1] == "--mcp":
-    print("Starting Tic-Tac-Toe MCP server...")
-    mcp.run()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe MCP server")
+    parser.add_argument("--mcp", action="store_true")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="stdio (one server per client) or a shared local HTTP transport")
+    parser.add_argument("--host", default=mcp.settings.host)
+    parser.add_argument("--port", type=int, default=mcp.settings.port)
+    parser.add_argument("--worker", action="store_true",
+                        help="expose export_game/load_game/drop_game for a router or client pool that owns this process")
+    options = parser.parse_args()
+
+    if options.worker:
+      enable_worker_tools()
+
+    if options.transport == "stdio":
+      print("Starting Tic-Tac-Toe MCP server...")
+    else:
+      mcp.settings.host = options.host
+      mcp.settings.port = options.port
+      path = mcp.settings.sse_path if options.transport == "sse" else mcp.settings.streamable_http_path
+      print(f"Starting Tic-Tac-Toe MCP server on http://{options.host}:{options.port}{path}")
+    mcp.run(transport=options.transport)
   else:
     # Handle JSON request from stdin
     handle_json_request()
\ No newline at end of file
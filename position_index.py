@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import sys
+import numpy as np
+from batch import CELL_VALUES, canonical, positions_from_cells
+from records import (
+  OUTCOME_UNFINISHED, OUTCOME_X, OUTCOME_O, OUTCOME_DRAW, GameRecordReader, FILE_HEADER, outcome_to_state
+)
+
+# On-disk inverted index over archived games (SQLite)
+#
+#   games:     one row per indexed game: outcome, moves (cell index bytes),
+#              source file and the record's byte offset in it
+#   positions: canonical position key -> game ids that passed through it
+#   stats:     canonical position key -> outcome counts
+#   sources:   record files and how far into each one has been indexed
+#
+# Position keys are batch.canonical keys, so all 8 rotations/reflections of
+# a position share one entry. The empty starting board is not indexed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+  game_id INTEGER PRIMARY KEY,
+  outcome INTEGER NOT NULL,
+  length INTEGER NOT NULL,
+  moves BLOB NOT NULL,
+  source TEXT,
+  offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS positions (
+  key INTEGER NOT NULL,
+  game_id INTEGER NOT NULL,
+  ply INTEGER NOT NULL,
+  PRIMARY KEY (key, game_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+  key INTEGER PRIMARY KEY,
+  games INTEGER NOT NULL DEFAULT 0,
+  x_wins INTEGER NOT NULL DEFAULT 0,
+  o_wins INTEGER NOT NULL DEFAULT 0,
+  draws INTEGER NOT NULL DEFAULT 0,
+  unfinished INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sources (
+  path TEXT PRIMARY KEY,
+  offset INTEGER NOT NULL,
+  games INTEGER NOT NULL
+);
+"""
+
+OUTCOME_COLUMNS = {
+  OUTCOME_X: "x_wins",
+  OUTCOME_O: "o_wins",
+  OUTCOME_DRAW: "draws",
+  OUTCOME_UNFINISHED: "unfinished",
+}
+
+CHUNK_GAMES = 50000
+
+def parse_board(board):
+  """
+  Convert a board to a (1, 9) int8 array
+
+  Accepts a get_state style 3x3 list or a 9 character string such as
+  "X...O...." ("." or " " for empty cells).
+  """
+  if isinstance(board, str):
+    cells = [" " if cell == "." else cell.upper() for cell in board]
+  else:
+    cells = [cell for row in board for cell in row]
+  if len(cells) != 9:
+    raise ValueError(f"A board has 9 cells, got {len(cells)}")
+  bad = sorted({repr(cell) for cell in cells if cell not in CELL_VALUES})
+  if bad:
+    raise ValueError(f"Board cells must be X, O, '.' or ' ', got {', '.join(bad)}")
+  return np.array([[CELL_VALUES[cell] for cell in cells]], dtype=np.int8)
+
+class PositionIndex:
+  """Inverted index from symmetry-canonical positions to games and outcomes"""
+
+  def __init__(self, path):
+    self.path = path
+    self.db = sqlite3.connect(path)
+    self.db.executescript(SCHEMA)
+
+  def close(self):
+    self.db.close()
+
+  def add_games(self, games, source=None, offsets=None):
+    """
+    Index games given as (outcome, cells) pairs, e.g. from GameRecordReader.iter_raw()
+
+    Args:
+        source: Where the games came from, e.g. a record file path
+        offsets: Byte offset of each game's record in source, if it is a record file
+
+    Returns:
+        int: Number of games added
+    """
+    with self.db:
+      return self._insert_games(games, source, offsets)
+
+  def _insert_games(self, games, source, offsets=None):
+    """add_games without its own transaction"""
+    games = list(games)
+    if not games:
+      return 0
+    outcomes = np.array([outcome for outcome, _ in games], dtype=np.int8)
+    cells = [bytes(moves) for _, moves in games]
+    offsets = offsets if offsets is not None else [None] * len(games)
+
+    first_id = self.db.execute("SELECT COALESCE(MAX(game_id), 0) + 1 FROM games").fetchone()[0]
+    game_ids = np.arange(first_id, first_id + len(games))
+    self.db.executemany(
+      "INSERT INTO games (game_id, outcome, length, moves, source, offset) VALUES (?, ?, ?, ?, ?, ?)",
+      ((int(game_id), int(outcome), len(moves), moves, source, offset)
+       for game_id, outcome, moves, offset in zip(game_ids, outcomes, cells, offsets))
+    )
+
+    boards, game_idx, ply = positions_from_cells(cells)
+    if not len(boards):
+      return len(games)
+    keys = canonical(boards)[1].astype(np.int64)
+    self.db.executemany(
+      "INSERT OR IGNORE INTO positions (key, game_id, ply) VALUES (?, ?, ?)",
+      zip(keys.tolist(), game_ids[game_idx].tolist(), ply.tolist())
+    )
+
+    # Aggregate outcome counts per position before touching the stats table
+    combined, counts = np.unique(keys * 4 + outcomes[game_idx], return_counts=True)
+    for outcome, column in OUTCOME_COLUMNS.items():
+      mask = combined % 4 == outcome
+      self.db.executemany(
+        f"INSERT INTO stats (key, games, {column}) VALUES (?, ?, ?) "
+        f"ON CONFLICT(key) DO UPDATE SET games = games + excluded.games, "
+        f"{column} = {column} + excluded.{column}",
+        ((key, count, count) for key, count in zip((combined[mask] // 4).tolist(), counts[mask].tolist()))
+      )
+    return len(games)
+
+  def add_record_file(self, path, chunk_games=CHUNK_GAMES):
+    """
+    Index the games in a record file that have not been indexed yet
+
+    Progress is stored per file, so re-running after more games are
+    appended only indexes the new ones.
+
+    Returns:
+        int: Number of games added
+    """
+    path = os.path.abspath(path)
+    row = self.db.execute("SELECT offset, games FROM sources WHERE path = ?", (path,)).fetchone()
+    offset, indexed = row if row else (len(FILE_HEADER), 0)
+
+    added = 0
+    with open(path, "rb") as f:
+      reader = GameRecordReader(f)
+      f.seek(offset)
+      chunk, offsets = [], []
+      for outcome, cells in reader.iter_raw():
+        chunk.append((outcome, cells))
+        offsets.append(offset)
+        offset += 1 + len(cells)
+        if len(chunk) >= chunk_games:
+          added += self._add_chunk(chunk, offsets, path, offset, indexed + added)
+          chunk, offsets = [], []
+      if chunk:
+        added += self._add_chunk(chunk, offsets, path, offset, indexed + added)
+    return added
+
+  def _add_chunk(self, chunk, offsets, path, offset, indexed):
+    """Index a chunk and advance the file's offset in one transaction"""
+    with self.db:
+      added = self._insert_games(chunk, path, offsets)
+      self.db.execute(
+        "INSERT INTO sources (path, offset, games) VALUES (?, ?, ?) "
+        "ON CONFLICT(path) DO UPDATE SET offset = excluded.offset, games = excluded.games",
+        (path, offset, indexed + added)
+      )
+    return added
+
+  def game(self, game_id):
+    """
+    Look up an indexed game, e.g. one returned by games_through
+
+    Returns:
+        dict: moves, winner and game_over as read from a record file, plus
+              source and offset (the record's byte offset in source, or
+              None for games not read from a record file); None if unknown
+    """
+    row = self.db.execute(
+      "SELECT outcome, moves, source, offset FROM games WHERE game_id = ?", (game_id,)
+    ).fetchone()
+    if row is None:
+      return None
+    outcome, moves, source, offset = row
+    winner, game_over = outcome_to_state(outcome)
+    return {
+      "game_id": game_id,
+      "moves": [divmod(cell, 3) for cell in moves],
+      "winner": winner,
+      "game_over": game_over,
+      "source": source,
+      "offset": offset
+    }
+
+  def position_key(self, board):
+    """Canonical key of a board (3x3 list or 9 character string)"""
+    return int(canonical(parse_board(board))[1][0])
+
+  def position_stats(self, board):
+    """
+    Outcome counts over all games that passed through a position or any of its symmetries
+
+    Returns:
+        dict: games, x_wins, o_wins, draws, unfinished
+    """
+    row = self.db.execute(
+      "SELECT games, x_wins, o_wins, draws, unfinished FROM stats WHERE key = ?",
+      (self.position_key(board),)
+    ).fetchone() or (0, 0, 0, 0, 0)
+    return dict(zip(("games", "x_wins", "o_wins", "draws", "unfinished"), row))
+
+  def games_through(self, board, limit=100):
+    """Ids of games that passed through a position or any of its symmetries"""
+    rows = self.db.execute(
+      "SELECT game_id FROM positions WHERE key = ? LIMIT ?", (self.position_key(board), limit)
+    )
+    return [game_id for (game_id,) in rows]
+
+  def move_stats(self, board, player):
+    """
+    Outcome counts for each legal move of player from a position
+
+    Returns:
+        dict: (row, col) -> position_stats of the board after that move
+
+    Raises:
+        ValueError: If the board is invalid or player is not X or O
+    """
+    if player not in ("X", "O"):
+      raise ValueError(f"Player must be X or O, got {player!r}")
+    cells = [cell for row in board for cell in row] if not isinstance(board, str) else list(board)
+    stats = {}
+    for cell in range(9):
+      if cells[cell] not in (" ", "."):
+        continue
+      after = cells[:]
+      after[cell] = player
+      stats[divmod(cell, 3)] = self.position_stats("".join(after))
+    return stats
+
+if __name__ == "__main__":
+  usage = "Usage: python position_index.py build <index.db> <games.tttr>...\n" \
+          "       python position_index.py query <index.db> <board, e.g. X...O....> [player]\n" \
+          "       python position_index.py game <index.db> <game_id>..."
+  if len(sys.argv) < 4 or sys.argv[1] not in ("build", "query", "game"):
+    print(usage)
+    sys.exit(1)
+
+  index = PositionIndex(sys.argv[2])
+  try:
+    if sys.argv[1] == "build":
+      for path in sys.argv[3:]:
+        added = index.add_record_file(path)
+        print(f"✅ Indexed {added} new games from {path}")
+    elif sys.argv[1] == "game":
+      if not all(game_id.isdigit() for game_id in sys.argv[3:]):
+        raise ValueError("Game ids are the integers listed by query")
+      games = [index.game(int(game_id)) for game_id in sys.argv[3:]]
+      print(json.dumps(games, indent=2))
+    else:
+      board = sys.argv[3]
+      result = {"position": index.position_stats(board), "games": index.games_through(board, limit=10)}
+      if len(sys.argv) > 4:
+        result["moves"] = {f"{row},{col}": stats for (row, col), stats in index.move_stats(board, sys.argv[4]).items()}
+      print(json.dumps(result, indent=2))
+  except (OSError, ValueError) as e:
+    print(f"❌ {e}")
+    sys.exit(1)
+  finally:
+    index.close()
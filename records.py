@@ -0,0 +1,313 @@
+import json
+import os
+import sys
+
+# Binary game-record format
+#
+#   file header:  b"TTTR" + version byte
+#   game record:  1 header byte + 1 byte per move
+#
+# The record header packs the number of moves (0-9) into the low nibble and
+# the outcome into bits 4-5. Each move byte is the cell index row * 3 + col.
+MAGIC = b"TTTR"
+VERSION = 1
+FILE_HEADER = MAGIC + bytes([VERSION])
+
+OUTCOME_UNFINISHED = 0
+OUTCOME_X = 1
+OUTCOME_O = 2
+OUTCOME_DRAW = 3
+
+WIN_LINES = (
+  (0, 1, 2), (3, 4, 5), (6, 7, 8),
+  (0, 3, 6), (1, 4, 7), (2, 5, 8),
+  (0, 4, 8), (2, 4, 6),
+)
+
+READ_CHUNK_SIZE = 1 << 16
+
+def replay(cells):
+  """
+  Replay a sequence of cell indices from an empty board
+
+  Args:
+      cells: Iterable of cell indices (row * 3 + col), X moves first
+
+  Returns:
+      int: Outcome code (OUTCOME_UNFINISHED, OUTCOME_X, OUTCOME_O, OUTCOME_DRAW)
+
+  Raises:
+      ValueError: If a move is off the board, on an occupied cell or after the game ended
+  """
+  board = [" "] * 9
+  player = "X"
+  outcome = OUTCOME_UNFINISHED
+  for n, cell in enumerate(cells):
+    if outcome != OUTCOME_UNFINISHED:
+      raise ValueError(f"Move {n} played after the game ended")
+    if not 0 <= cell <= 8:
+      raise ValueError(f"Move {n} is off the board: {cell}")
+    if board[cell] != " ":
+      raise ValueError(f"Move {n} plays on an occupied cell: {cell}")
+    board[cell] = player
+    for a, b, c in WIN_LINES:
+      if board[a] == board[b] == board[c] == player:
+        outcome = OUTCOME_X if player == "X" else OUTCOME_O
+        break
+    else:
+      if n == 8:
+        outcome = OUTCOME_DRAW
+    player = "O" if player == "X" else "X"
+  return outcome
+
+def outcome_to_state(outcome):
+  """Convert an outcome code to the (winner, game_over) pair used by get_state"""
+  if outcome == OUTCOME_X:
+    return "X", True
+  if outcome == OUTCOME_O:
+    return "O", True
+  return None, outcome == OUTCOME_DRAW
+
+def encode_game(cells):
+  """Encode a game given as cell indices into a binary record"""
+  cells = bytes(cells)
+  outcome = replay(cells)
+  return bytes([(outcome << 4) | len(cells)]) + cells
+
+def parse_move(move):
+  """
+  Convert a move from any of the repo's JSON shapes to a cell index
+
+  Accepts {"row": r, "col": c}, play_move request args, and
+  game_history style (player, row, col) or (row, col) sequences.
+  """
+  if isinstance(move, dict):
+    if "input" in move or "args" in move:
+      move = move.get("input") or move.get("args")
+    row, col = move["row"], move["col"]
+  elif len(move) == 3:
+    _, row, col = move
+  else:
+    row, col = move
+  if not (0 <= row <= 2 and 0 <= col <= 2):
+    raise ValueError(f"Move out of bounds: ({row},{col})")
+  return row * 3 + col
+
+def read_header(fp):
+  """Read and check the file header, leaving fp at the first game record"""
+  header = fp.read(len(FILE_HEADER))
+  if header[:len(MAGIC)] != MAGIC:
+    raise ValueError("Not a game record file")
+  if header[len(MAGIC):] != bytes([VERSION]):
+    raise ValueError(f"Unsupported game record version: {header[len(MAGIC):]!r}")
+
+class GameRecordWriter:
+  """Stream games into a binary record file"""
+
+  def __init__(self, fp, append=False):
+    """
+    Args:
+        fp: Binary file object to write to
+        append: fp is positioned at the end of an existing archive (opened
+                with "ab"), so the file header is not written again
+    """
+    self.fp = fp
+    self.count = 0
+    if not (append and fp.tell() > 0):
+      self.fp.write(FILE_HEADER)
+
+  @classmethod
+  def open(cls, path, append=False):
+    """Open a record file, adding to it instead of truncating when append is set"""
+    if append and os.path.exists(path) and os.path.getsize(path) > 0:
+      with open(path, "rb") as f:
+        read_header(f)
+      return cls(open(path, "ab"), append=True)
+    return cls(open(path, "wb"))
+
+  def close(self):
+    self.fp.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def write_cells(self, cells):
+    """Write one game given as cell indices (row * 3 + col)"""
+    self.fp.write(encode_game(cells))
+    self.count += 1
+
+  def write_game(self, moves):
+    """Write one game given as (row, col) pairs or any shape parse_move accepts"""
+    self.write_cells([parse_move(move) for move in moves])
+
+class GameRecordReader:
+  """Stream games back out of a binary record file"""
+
+  def __init__(self, fp, chunk_size=READ_CHUNK_SIZE):
+    self.fp = fp
+    self.chunk_size = chunk_size
+    read_header(fp)
+
+  def iter_raw(self):
+    """
+    Yield (outcome, cells) for every game without building Python move lists
+
+    cells is a bytes object of cell indices; this is the fast path for
+    analysis jobs that only need to scan the archive.
+
+    Raises:
+        ValueError: If a record header is corrupt or the file is truncated
+    """
+    buffer = b""
+    pos = 0
+    offset = self.fp.tell()  # file offset of buffer[0]
+    while True:
+      chunk = self.fp.read(self.chunk_size)
+      if not chunk:
+        break
+      offset += pos
+      buffer = buffer[pos:] + chunk
+      pos = 0
+      end = len(buffer)
+      while pos < end:
+        header = buffer[pos]
+        length = header & 0x0F
+        outcome = header >> 4
+        if length > 9 or outcome > OUTCOME_DRAW:
+          raise ValueError(f"Corrupt game record at byte {offset + pos}: header {header:#04x}")
+        if pos + 1 + length > end:
+          break
+        cells = buffer[pos + 1:pos + 1 + length]
+        if cells and max(cells) > 8:
+          raise ValueError(f"Corrupt game record at byte {offset + pos}: move off the board")
+        yield outcome, cells
+        pos += 1 + length
+    if pos < len(buffer):
+      raise ValueError("Truncated game record at end of file")
+
+  def __iter__(self):
+    """Yield games as dicts shaped like get_state: moves, winner, game_over"""
+    for outcome, cells in self.iter_raw():
+      winner, game_over = outcome_to_state(outcome)
+      yield {
+        "moves": [divmod(cell, 3) for cell in cells],
+        "winner": winner,
+        "game_over": game_over
+      }
+
+def read_games(path):
+  """Yield every game stored in a binary record file"""
+  with open(path, "rb") as f:
+    yield from GameRecordReader(f)
+
+def iter_json_games(path):
+  """
+  Yield move lists from the repo's JSON/JSONL formats
+
+  - .json files: every object with a "moves" list (e.g. test_inputs.json)
+  - .jsonl files: one game per line ({"moves": [...]}), or a stream of
+    tool requests where reset_game starts a new game and play_move adds a move
+  """
+  if path.endswith(".jsonl"):
+    with open(path) as f:
+      moves = []
+      for line in f:
+        line = line.strip()
+        if not line:
+          continue
+        data = json.loads(line)
+        if "moves" in data:
+          yield data["moves"]
+        elif data.get("tool") == "reset_game":
+          if moves:
+            yield moves
+          moves = []
+        elif data.get("tool") == "play_move":
+          moves.append(data)
+      if moves:
+        yield moves
+  else:
+    with open(path) as f:
+      stack = [json.load(f)]
+    while stack:
+      node = stack.pop()
+      if isinstance(node, dict):
+        if isinstance(node.get("moves"), list):
+          yield node["moves"]
+        else:
+          stack.extend(reversed(list(node.values())))
+      elif isinstance(node, list):
+        stack.extend(reversed(node))
+
+def import_games(src, dst, append=False):
+  """
+  Convert JSON/JSONL games into a binary record file
+
+  Args:
+      append: Add the games to dst if it already exists instead of replacing it
+
+  Returns:
+      tuple: (games written, games skipped as invalid)
+  """
+  skipped = 0
+  with GameRecordWriter.open(dst, append=append) as writer:
+    for moves in iter_json_games(src):
+      try:
+        writer.write_game(moves)
+      except (KeyError, TypeError, ValueError) as e:
+        skipped += 1
+        print(f"⚠️ Skipping invalid game: {e}", file=sys.stderr)
+  return writer.count, skipped
+
+def export_games(src, dst, requests=False):
+  """
+  Convert a binary record file into JSONL
+
+  By default each line is one game ({"moves", "winner", "game_over"}).
+  With requests=True the output is a stream of reset_game/play_move tool
+  requests that can be replayed against main.py.
+
+  Returns:
+      int: Number of games exported
+  """
+  count = 0
+  # Open and check the source first so a bad source does not truncate dst
+  with open(src, "rb") as f:
+    reader = GameRecordReader(f)
+    with open(dst, "w") as out:
+      for game in reader:
+        moves = [{"row": row, "col": col} for row, col in game["moves"]]
+        if requests:
+          out.write(json.dumps({"tool": "reset_game", "args": {}}) + "\n")
+          for move in moves:
+            out.write(json.dumps({"tool": "play_move", "args": move}) + "\n")
+        else:
+          out.write(json.dumps({
+            "moves": moves,
+            "winner": game["winner"],
+            "game_over": game["game_over"]
+          }) + "\n")
+        count += 1
+  return count
+
+if __name__ == "__main__":
+  usage = "Usage: python records.py import <src.json|src.jsonl> <dst.tttr> [--append]\n" \
+          "       python records.py export <src.tttr> <dst.jsonl> [--requests]"
+  if len(sys.argv) < 4 or sys.argv[1] not in ("import", "export"):
+    print(usage)
+    sys.exit(1)
+
+  try:
+    if sys.argv[1] == "import":
+      written, skipped = import_games(sys.argv[2], sys.argv[3], append="--append" in sys.argv[4:])
+      print(f"✅ Imported {written} games ({skipped} skipped)")
+    else:
+      exported = export_games(sys.argv[2], sys.argv[3], requests="--requests" in sys.argv[4:])
+      print(f"✅ Exported {exported} games")
+  except (OSError, ValueError) as e:
+    # json.JSONDecodeError is a ValueError
+    print(f"❌ {e}")
+    sys.exit(1)
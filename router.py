@@ -0,0 +1,347 @@
+from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+from bisect import bisect, insort
+from client import BackgroundClient, MCP_SERVER_CMD, MCP_WORKER_ARGS
+from main import DEFAULT_GAME_ID, PlayMoveInput
+from utils import extract_result_text
+import asyncio, hashlib, json, logging, itertools
+
+logging.getLogger("mcp").setLevel(logging.CRITICAL)
+
+VIRTUAL_NODES = 64
+# Only games these tools have touched are tracked for migration; reads on
+# unknown ids never create a game on the worker, so they are not tracked
+STATE_CHANGING_TOOLS = {"reset_game", "play_move"}
+
+class HashRing:
+  """Consistent hash ring mapping game ids to worker names"""
+
+  def __init__(self, nodes=(), replicas=VIRTUAL_NODES):
+    self.replicas = replicas
+    self._keys = []
+    self._owners = {}
+    for node in nodes:
+      self.add(node)
+
+  @staticmethod
+  def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+  def add(self, node):
+    for i in range(self.replicas):
+      key = self._hash(f"{node}#{i}")
+      self._owners[key] = node
+      insort(self._keys, key)
+
+  def remove(self, node):
+    self._keys = [key for key in self._keys if self._owners[key] != node]
+    self._owners = {key: self._owners[key] for key in self._keys}
+
+  def copy(self):
+    ring = HashRing(replicas=self.replicas)
+    ring._keys = list(self._keys)
+    ring._owners = dict(self._owners)
+    return ring
+
+  def get(self, game_id):
+    if not self._keys:
+      raise LookupError("No workers available")
+    i = bisect(self._keys, self._hash(game_id)) % len(self._keys)
+    return self._owners[self._keys[i]]
+
+class Worker:
+  """One main.py server process owned by the router"""
+
+  def __init__(self, name, url=None, command=MCP_SERVER_CMD, args=MCP_WORKER_ARGS):
+    self.name = name
+    self.client = BackgroundClient(command=command, args=args, url=url)
+
+  async def start(self):
+    return await self.client.start()
+
+  async def stop(self):
+    await self.client.close()
+
+  async def call_tool(self, tool_name, args):
+    """Run a tool on the worker, raising if it fails so the error reaches the router's client"""
+    if not self.client.session:
+      raise RuntimeError(f"Worker {self.name} is not connected")
+    try:
+      result = await self.client.session.call_tool(name=tool_name, arguments=args)
+    except Exception as e:
+      raise RuntimeError(f"Worker {self.name} failed to run {tool_name}: {e}") from e
+    if result.isError:
+      raise RuntimeError(f"Worker {self.name} failed to run {tool_name}: {extract_result_text(result.content)}")
+    return result.content
+
+class Router:
+  """Route game tool calls to a pool of main.py workers by consistent hashing"""
+
+  def __init__(self, worker_count=1, worker_urls=(), command=MCP_SERVER_CMD, args=MCP_WORKER_ARGS):
+    self.worker_count = worker_count
+    self.worker_urls = list(worker_urls)
+    self.command = command
+    self.args = args
+    self.workers = {}
+    self.ring = HashRing()
+    self.games = set()
+    self.game_locks = {}
+    self._lock_users = {}
+    self._rebalance_lock = asyncio.Lock()
+    self._start_lock = asyncio.Lock()
+    # Gate between routed calls and ring switches: a migration waits for
+    # in-flight calls to finish and holds new ones until the ring is swapped
+    self._gate = asyncio.Condition()
+    self._calls = 0
+    self._migrating = False
+    self._names = itertools.count()
+    self._started = False
+
+  async def start(self):
+    """
+    Start the initial workers on first use
+
+    Workers are started lazily from the serving event loop rather than a
+    FastMCP lifespan, which runs once per client session over HTTP.
+    """
+    if self._started:
+      return
+    async with self._start_lock:
+      if self._started:
+        return
+      added = []
+      try:
+        for url in self.worker_urls:
+          added.append((await self.add_worker(url))[0])
+        for _ in range(0 if self.worker_urls else self.worker_count):
+          added.append((await self.add_worker())[0])
+      except Exception:
+        # Undo this attempt so the next call starts from scratch, not on top of it
+        for name in reversed(added):
+          self.ring.remove(name)
+          await self.workers.pop(name).stop()
+        raise
+      self._started = True
+
+  @asynccontextmanager
+  async def _routing(self):
+    """Count a call as in flight, waiting first if the ring is being switched"""
+    async with self._gate:
+      await self._gate.wait_for(lambda: not self._migrating)
+      self._calls += 1
+    try:
+      yield
+    finally:
+      async with self._gate:
+        self._calls -= 1
+        self._gate.notify_all()
+
+  @asynccontextmanager
+  async def _exclusive(self):
+    """Hold off all routed calls while the ring is switched"""
+    async with self._gate:
+      self._migrating = True
+      await self._gate.wait_for(lambda: self._calls == 0)
+    try:
+      yield
+    finally:
+      async with self._gate:
+        self._migrating = False
+        self._gate.notify_all()
+
+  @asynccontextmanager
+  async def _game_lock(self, game_id):
+    """Hold a game's lock for one call, dropping the lock once no call uses it"""
+    lock = self.game_locks.setdefault(game_id, asyncio.Lock())
+    self._lock_users[game_id] = self._lock_users.get(game_id, 0) + 1
+    try:
+      async with lock:
+        yield
+    finally:
+      self._lock_users[game_id] -= 1
+      if not self._lock_users[game_id]:
+        del self._lock_users[game_id]
+        del self.game_locks[game_id]
+
+  async def call(self, tool_name, args, game_id):
+    await self.start()
+    async with self._routing():
+      async with self._game_lock(game_id):
+        worker = self.workers[self.ring.get(game_id)]
+        content = await worker.call_tool(tool_name, {**args, "game_id": game_id})
+        if tool_name in STATE_CHANGING_TOOLS:
+          self.games.add(game_id)
+        return content
+
+  async def _migrate(self, new_ring):
+    """
+    Switch to new_ring, moving every known game whose owner changes
+
+    Games are copied to their new owners first and the ring is swapped only
+    once every copy succeeded; the old copies are dropped after that. If a
+    copy fails, the partial copies are dropped and the old ring is kept.
+    Games the old owner has already evicted are forgotten, not copied.
+    """
+    async with self._exclusive():
+      moves = []
+      for game_id in sorted(self.games):
+        old, new = self.ring.get(game_id), new_ring.get(game_id)
+        if old != new:
+          moves.append((game_id, old, new))
+
+      copied = []
+      evicted = set()
+      try:
+        for game_id, old, new in moves:
+          content = await self.workers[old].call_tool("export_game", {"game_id": game_id})
+          state = json.loads(extract_result_text(content))["state"]
+          if state is None:
+            evicted.add(game_id)
+            continue
+          copied.append((game_id, new))
+          await self.workers[new].call_tool("load_game", {"state": state, "game_id": game_id})
+      except Exception:
+        for game_id, new in copied:
+          try:
+            await self.workers[new].call_tool("drop_game", {"game_id": game_id})
+          except Exception as e:
+            print(f"⚠️ Could not drop partial copy of {game_id} from {new}: {e}")
+        raise
+      self.ring = new_ring
+      self.games -= evicted
+
+    # Calls already route to the new owners, so the old copies are unused
+    moves = [move for move in moves if move[0] not in evicted]
+    for game_id, old, _ in moves:
+      try:
+        await self.workers[old].call_tool("drop_game", {"game_id": game_id})
+      except Exception as e:
+        print(f"⚠️ Could not drop moved game {game_id} from {old}: {e}")
+    return len(moves)
+
+  async def add_worker(self, url=None):
+    """Start a worker and rebalance games onto it; returns (name, games moved)"""
+    async with self._rebalance_lock:
+      name = f"worker-{next(self._names)}"
+      worker = Worker(name, url=url, command=self.command, args=self.args)
+      if not await worker.start():
+        await worker.stop()
+        raise RuntimeError(f"Could not start {name}")
+      self.workers[name] = worker
+      new_ring = self.ring.copy()
+      new_ring.add(name)
+      if len(self.workers) == 1:
+        self.ring = new_ring
+        return name, 0
+      try:
+        return name, await self._migrate(new_ring)
+      except Exception:
+        await self.workers.pop(name).stop()
+        raise
+
+  async def remove_worker(self, name):
+    """Move a worker's games to the remaining workers and stop it"""
+    async with self._rebalance_lock:
+      if name not in self.workers:
+        raise KeyError(name)
+      if len(self.workers) == 1:
+        raise RuntimeError("Cannot remove the last worker")
+      new_ring = self.ring.copy()
+      new_ring.remove(name)
+      moved = await self._migrate(new_ring)
+      await self.workers.pop(name).stop()
+      return moved
+
+  async def close(self):
+    for name in reversed(list(self.workers)):
+      await self.workers.pop(name).stop()
+
+  def placement(self):
+    """Number of known games on each worker"""
+    counts = {name: 0 for name in self.workers}
+    for game_id in self.games:
+      counts[self.ring.get(game_id)] += 1
+    return counts
+
+# Create the front MCP server; it exposes the same game tools as main.py
+mcp = FastMCP("Tic-Tac-Toe Router")
+router = Router()
+
+@mcp.tool("reset_game")
+async def reset_game(game_id: str = DEFAULT_GAME_ID):
+  return await router.call("reset_game", {}, game_id)
+
+@mcp.tool("show_board")
+async def show_board(game_id: str = DEFAULT_GAME_ID):
+  return await router.call("show_board", {}, game_id)
+
+@mcp.tool("get_state")
+async def get_state(game_id: str = DEFAULT_GAME_ID):
+  return await router.call("get_state", {}, game_id)
+
+@mcp.tool("play_move")
+async def play_move(input: PlayMoveInput, game_id: str = DEFAULT_GAME_ID):
+  return await router.call("play_move", {"input": input.model_dump()}, game_id)
+
+# Admin tools: only registered with --admin. They let a client start
+# processes, connect the router to arbitrary URLs and remove workers.
+async def add_worker(url: str | None = None):
+  """Start another worker (or attach one served at url) and rebalance games"""
+  await router.start()
+  name, moved = await router.add_worker(url)
+  return {"worker": name, "games_moved": moved, "placement": router.placement()}
+
+async def remove_worker(name: str):
+  """Move a worker's games elsewhere and stop it"""
+  await router.start()
+  moved = await router.remove_worker(name)
+  return {"worker": name, "games_moved": moved, "placement": router.placement()}
+
+async def list_workers():
+  """Number of known games on each worker"""
+  await router.start()
+  return router.placement()
+
+def enable_admin_tools():
+  mcp.add_tool(add_worker, name="add_worker")
+  mcp.add_tool(remove_worker, name="remove_worker")
+  mcp.add_tool(list_workers, name="list_workers")
+
+if __name__ == "__main__":
+  import argparse, os, shlex
+
+  parser = argparse.ArgumentParser(description="Sharded Tic-Tac-Toe MCP server")
+  parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                      help="number of main.py worker processes to spawn")
+  parser.add_argument("--worker-url", action="append", default=[],
+                      help="attach an already running HTTP worker (main.py --worker) instead (repeatable)")
+  parser.add_argument("--worker-command", default=shlex.join([MCP_SERVER_CMD, *MCP_WORKER_ARGS]),
+                      help="command that starts one stdio worker (main.py with --mcp --worker)")
+  parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio")
+  parser.add_argument("--host", default=mcp.settings.host)
+  parser.add_argument("--port", type=int, default=mcp.settings.port)
+  parser.add_argument("--admin", action="store_true",
+                      help="expose add_worker/remove_worker/list_workers tools to clients")
+  options = parser.parse_args()
+
+  if options.admin:
+    enable_admin_tools()
+
+  router.worker_count = options.workers
+  router.worker_urls = options.worker_url
+  router.command, *router.args = shlex.split(options.worker_command)
+  mcp.settings.host = options.host
+  mcp.settings.port = options.port
+
+  async def serve():
+    run = {
+      "stdio": mcp.run_stdio_async,
+      "sse": mcp.run_sse_async,
+      "streamable-http": mcp.run_streamable_http_async,
+    }[options.transport]
+    try:
+      await run()
+    finally:
+      await router.close()
+
+  asyncio.run(serve())
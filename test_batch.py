@@ -0,0 +1,72 @@
+import numpy as np
+import batch
+from records import outcome_to_state, replay
+from test_helpers import random_games, run_tests
+
+def slow_board(cells):
+  board = [batch.EMPTY] * 9
+  for n, cell in enumerate(cells):
+    board[cell] = batch.X if n % 2 == 0 else batch.O
+  return board
+
+def test_matches_replay():
+  """Vectorized winner/game_over agree with the pure Python replay"""
+  games = random_games(5000)
+  result = batch.evaluate(batch.boards_from_cells(games))
+  for cells, winner, game_over in zip(games, result["winner"], result["game_over"]):
+    assert (batch.PLAYER_NAMES[winner], bool(game_over)) == outcome_to_state(replay(cells))
+
+def test_bitboards_round_trip():
+  boards = batch.boards_from_cells(random_games(1000))
+  packed = batch.pack_bitboards(boards)
+  assert (batch.unpack_bitboards(packed) == boards).all()
+  # Plain Python ints and int64 arrays are read as bitboards too
+  assert (batch.as_boards(packed.tolist()) == boards).all()
+  assert (batch.as_boards(packed.astype(np.int64)) == boards).all()
+
+def test_ambiguous_and_invalid_input():
+  for bad in (
+    [0] * 9,                         # one board or nine bitboards?
+    np.zeros(9, dtype=np.int64),
+    [1 << 18],                       # too many bits
+    [1 | (1 << 9)],                  # X and O on the same cell
+    np.full((2, 9), 3),              # not a cell value
+    np.zeros((2, 3, 3)),             # wrong shape
+    np.zeros((2, 9), dtype=float),
+  ):
+    try:
+      batch.as_boards(bad)
+    except ValueError:
+      pass
+    else:
+      raise AssertionError(f"{bad!r} should be rejected")
+  assert batch.as_boards(np.zeros(9, dtype=np.uint32)).shape == (9, 9)
+
+def test_positions_from_cells():
+  games = random_games(2000, seed=1)
+  boards, game_idx, ply = batch.positions_from_cells(games)
+  expected = [(g, p, slow_board(cells[:p])) for g, cells in enumerate(games) for p in range(1, len(cells) + 1)]
+  assert len(boards) == len(expected)
+  assert game_idx.tolist() == [g for g, _, _ in expected]
+  assert ply.tolist() == [p for _, p, _ in expected]
+  assert boards.tolist() == [board for _, _, board in expected]
+
+def test_canonical_symmetries():
+  """All 8 rotations/reflections share one key; tic-tac-toe has 765 distinct positions"""
+  boards, _, _ = batch.positions_from_cells(random_games(20000, seed=2))
+  for board in boards[:300]:
+    keys = batch.canonical(board[batch.SYMMETRIES])[1]
+    assert len(set(keys.tolist())) == 1
+  keys = set(batch.canonical(boards)[1].tolist()) | {0}
+  assert len(keys) == 765
+
+def test_legal_moves():
+  board = batch.encode_boards([[["X", " ", " "], [" ", "O", " "], [" ", " ", " "]]])
+  result = batch.evaluate(board)
+  assert result["legal_moves"][0].tolist() == [False, True, True, True, False, True, True, True, True]
+  assert result["current_player"][0] == batch.X
+  won = batch.encode_boards([[["X", "X", "X"], ["O", "O", " "], [" ", " ", " "]]])
+  assert not batch.evaluate(won)["legal_moves"].any()
+
+if __name__ == "__main__":
+  run_tests(globals(), "batch evaluation")
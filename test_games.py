@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+import main
+from main import PlayMoveInput
+from test_helpers import run_tests
+
+class Clock:
+  """Stand-in for time.monotonic that only moves when told to"""
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+@contextmanager
+def fresh_server():
+  """Empty main.py's game registry and give it a controllable clock"""
+  for registry in (main.games, main.game_locks, main.lock_users, main.last_used):
+    registry.clear()
+  main.last_eviction = 0.0
+  clock = Clock()
+  with mock.patch.object(main, "time", SimpleNamespace(monotonic=clock)):
+    yield clock
+
+def play(game_id, *moves):
+  async def run():
+    for row, col in moves:
+      await main.play_move(PlayMoveInput(row=row, col=col), game_id=game_id)
+  asyncio.run(run())
+
+X_WINS = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+
+def test_games_are_independent():
+  """Each game_id has its own board and player to move"""
+  with fresh_server():
+    play("a", (0, 0))
+    play("b", (1, 1), (2, 2))
+    state_a = asyncio.run(main.get_state(game_id="a"))
+    state_b = asyncio.run(main.get_state(game_id="b"))
+    assert state_a["board"][0][0] == "X" and state_a["current_player"] == "O"
+    assert state_b["board"][1][1] == "X" and state_b["board"][2][2] == "O"
+    assert state_b["current_player"] == "X"
+
+def test_reads_do_not_create_games():
+  """get_state and show_board on an unknown id read a new game without storing it or its lock"""
+  with fresh_server():
+    state = asyncio.run(main.get_state(game_id="nobody"))
+    assert state["board"] == [[" "] * 3] * 3 and state["current_player"] == "X"
+    assert "Current player: X" in asyncio.run(main.show_board(game_id="nobody"))
+    assert main.games == {} and main.game_locks == {} and main.lock_users == {}
+
+def test_locks_are_freed():
+  """A game keeps its lock while it exists and loses it once forgotten"""
+  with fresh_server():
+    play("kept", (0, 0))
+    assert set(main.game_locks) == {"kept"} and main.lock_users == {}
+    assert main.forget_game("kept")
+    assert main.games == {} and main.game_locks == {} and main.lock_users == {}
+
+def test_idle_games_are_evicted():
+  """Finished games expire after FINISHED_GAME_TTL and unfinished ones after IDLE_GAME_TTL"""
+  with fresh_server() as clock:
+    play("finished", *X_WINS)
+    play("unfinished", (1, 1))
+
+    clock.now += main.EVICT_INTERVAL / 2
+    play("trigger-1", (0, 0))
+    assert {"finished", "unfinished"} <= set(main.games)  # too soon for a sweep
+
+    clock.now += main.FINISHED_GAME_TTL
+    play("trigger-2", (0, 0))
+    assert "finished" not in main.games and "finished" not in main.game_locks
+    assert "unfinished" in main.games
+
+    clock.now += main.IDLE_GAME_TTL + 1
+    play("trigger-3", (0, 0))
+    assert set(main.games) == {"trigger-3"}
+    assert set(main.game_locks) == {"trigger-3"} and set(main.last_used) == {"trigger-3"}
+
+def test_used_games_are_not_evicted():
+  """Calls refresh a game's idle time, and a game whose lock is in use is never evicted"""
+  with fresh_server() as clock:
+    play("active", (0, 0))
+    play("busy", (0, 0))
+    clock.now += main.IDLE_GAME_TTL - 1
+    asyncio.run(main.get_state(game_id="active"))
+    main.lock_users["busy"] = 1  # a call on it is still running
+    clock.now += 2
+    assert main.evict_idle_games(force=True) == 0
+    assert {"active", "busy"} <= set(main.games)
+    del main.lock_users["busy"]
+
+if __name__ == "__main__":
+  run_tests(globals(), "game registry")
@@ -0,0 +1,27 @@
+import random
+from records import replay
+
+def random_game(rng, min_moves=0):
+  """A random legal game as cell indices (row * 3 + col), ending early if someone wins"""
+  cells = list(range(9))
+  rng.shuffle(cells)
+  game = []
+  for cell in cells[:rng.randint(min_moves, 9)]:
+    game.append(cell)
+    if replay(game):
+      break
+  return game
+
+def random_games(n, seed=0, min_moves=0):
+  """n random games as bytes, e.g. for batch.boards_from_cells"""
+  rng = random.Random(seed)
+  return [bytes(random_game(rng, min_moves)) for _ in range(n)]
+
+def run_tests(namespace, title):
+  """Run every test_* function in a module's globals, for `python test_<name>.py`"""
+  print(f"🧪 Testing {title}...")
+  for name, test in list(namespace.items()):
+    if name.startswith("test_") and callable(test):
+      test()
+      print(f"✅ {name}")
+  print("\n✅ All tests completed!")
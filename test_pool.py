@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from client import ClientPool
+from test_helpers import run_tests
+
+# Cheap local workers: main.py run directly by this interpreter, not through uv
+WORKER = {"command": sys.executable, "args": ["main.py", "--mcp", "--worker"]}
+
+def run_pool(test, **options):
+  """Run test(pool) against a started pool and always close it"""
+  async def run():
+    pool = ClientPool(health_interval=3600, **WORKER, **options)
+    try:
+      await pool.start()
+      return await test(pool)
+    finally:
+      await pool.close()
+      assert pool.clients == [] and pool._starting == 0 and not pool._tasks
+  return asyncio.run(run())
+
+async def settle(pool):
+  """Wait for the pool's background spawns and replacements"""
+  while pool._tasks:
+    await asyncio.gather(*pool._tasks)
+
+def test_oversubscribe_spawns_in_background():
+  """A full pool hands out the least busy server at once and grows up to max_size"""
+  async def test(pool):
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert second.session is first.session
+    assert pool._starting == 1 and len(pool._tasks) == 1
+    third = await pool.acquire()
+    assert pool._starting == 1  # already growing; never past max_size
+    await settle(pool)
+    assert len(pool.clients) == 2 and pool._starting == 0
+    fourth = await pool.acquire()
+    assert fourth.session is not first.session
+    for game in (first, second, third, fourth):
+      await pool.release(game)
+    assert sorted(pool.active.values()) == [0, 0]
+
+  run_pool(test, size=1, max_size=2, games_per_client=1)
+
+def test_spent_server_is_retired():
+  """A server is not handed out after max_games and is replaced once its games end"""
+  async def test(pool):
+    (first,) = pool.clients
+    games = [await pool.acquire() for _ in range(2)]
+    assert pool.served[first] == 2
+
+    # The only server is spent and the pool is at max_size: acquire waits
+    waiting = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.2)
+    assert not waiting.done()
+
+    for game in games:
+      await pool.release(game)
+    assert first not in pool.clients  # release returns before the replacement is up
+    game = await asyncio.wait_for(waiting, 30)
+    assert game.session is not first.session
+    assert pool.clients and first not in pool.clients
+    await pool.release(game)
+
+  run_pool(test, size=1, max_size=1, max_games=2)
+
+def test_failed_health_check_replaces_server():
+  """Busy and idle servers that stop answering pings are replaced"""
+  async def test(pool):
+    game = await pool.acquire()
+    busy = next(c for c in pool.clients if c.session is game.session)
+    idle = next(c for c in pool.clients if c is not busy)
+
+    async def dead(timeout=5):
+      return False
+
+    busy.ping = idle.ping = dead
+    await pool.check_health()
+    assert busy not in pool.clients and idle not in pool.clients
+    assert len(pool.clients) == 2 and pool._starting == 0
+    assert all(pool.active[client] == 0 for client in pool.clients)
+    await pool.release(game)  # its server is gone; nothing to return
+
+  run_pool(test, size=2, max_size=2)
+
+def test_close_during_health_check():
+  """Closing while the health check is spawning leaves no servers or reservations behind"""
+  async def test(pool):
+    for client in pool.clients:
+      async def dead(timeout=5):
+        return False
+      client.ping = dead
+    pool.health_interval = 0
+    pool._health_task.cancel()
+    pool._health_task = asyncio.create_task(pool._health_loop())
+    while not pool._starting:
+      await asyncio.sleep(0.01)
+
+  run_pool(test, size=1, max_size=1)
+
+if __name__ == "__main__":
+  run_tests(globals(), "client pool")
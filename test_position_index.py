@@ -0,0 +1,136 @@
+import os
+import random
+import tempfile
+from batch import SYMMETRIES
+from position_index import PositionIndex, parse_board
+from records import OUTCOME_DRAW, OUTCOME_O, OUTCOME_X, GameRecordWriter, encode_game, replay
+from test_helpers import random_game, run_tests
+
+def positions(game):
+  """Every board a game passed through, as 9 character strings"""
+  board = [" "] * 9
+  for n, cell in enumerate(game):
+    board[cell] = "XO"[n % 2]
+    yield "".join(board)
+
+def variants(board):
+  """All rotations/reflections of a board string, with " " for empty cells"""
+  board = board.replace(".", " ")
+  return {"".join(board[i] for i in perm) for perm in SYMMETRIES.tolist()}
+
+def write_games(path, games, append=False):
+  with GameRecordWriter.open(path, append=append) as writer:
+    for game in games:
+      writer.write_cells(game)
+
+def test_matches_brute_force():
+  """Stats and game lists agree with scanning every game, across symmetries and chunks"""
+  rng = random.Random(0)
+  games = [random_game(rng, min_moves=1) for _ in range(500)]
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    write_games(path, games)
+    index = PositionIndex(os.path.join(tmp, "index.db"))
+    try:
+      assert index.add_record_file(path, chunk_games=64) == len(games)
+      for board in ("X........", "....X....", "X...O....", "XO..X...."):
+        through = [n + 1 for n, game in enumerate(games) if variants(board) & set(positions(game))]
+        outcomes = [replay(games[game_id - 1]) for game_id in through]
+        stats = index.position_stats(board)
+        assert stats["games"] == len(through)
+        assert stats["x_wins"] == outcomes.count(OUTCOME_X)
+        assert stats["o_wins"] == outcomes.count(OUTCOME_O)
+        assert stats["draws"] == outcomes.count(OUTCOME_DRAW)
+        assert sorted(index.games_through(board, limit=len(games))) == through
+    finally:
+      index.close()
+
+def test_incremental_build():
+  """Re-indexing a file after appending only adds the new games"""
+  rng = random.Random(1)
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    write_games(path, [random_game(rng, min_moves=1) for _ in range(30)])
+    index = PositionIndex(os.path.join(tmp, "index.db"))
+    try:
+      assert index.add_record_file(path) == 30
+      assert index.add_record_file(path) == 0
+      write_games(path, [random_game(rng, min_moves=1) for _ in range(12)], append=True)
+      assert index.add_record_file(path) == 12
+      assert index.position_stats("X........")["games"] + index.position_stats("....X....")["games"] \
+        + index.position_stats(".X.......")["games"] == 42
+    finally:
+      index.close()
+
+def test_failed_chunk_is_not_recorded():
+  """A chunk that fails leaves neither its games nor a new file offset behind"""
+  class FailingIndex(PositionIndex):
+    def _insert_games(self, *args):
+      super()._insert_games(*args)
+      raise RuntimeError("disk full")
+
+  rng = random.Random(2)
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    write_games(path, [random_game(rng, min_moves=1) for _ in range(10)])
+    db_path = os.path.join(tmp, "index.db")
+    index = FailingIndex(db_path)
+    try:
+      index.add_record_file(path)
+    except RuntimeError:
+      pass
+    else:
+      raise AssertionError("indexing should have failed")
+    finally:
+      index.close()
+
+    index = PositionIndex(db_path)
+    try:
+      for table in ("games", "positions", "stats", "sources"):
+        assert index.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+      assert index.add_record_file(path) == 10
+    finally:
+      index.close()
+
+def test_game_lookup():
+  """Indexed game ids map back to their moves and to their record in the source file"""
+  rng = random.Random(3)
+  games = [random_game(rng, min_moves=1) for _ in range(100)]
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    write_games(path, games)
+    index = PositionIndex(os.path.join(tmp, "index.db"))
+    try:
+      index.add_record_file(path, chunk_games=16)
+      chat_game = [4, 0, 8]
+      index.add_games([(replay(chat_game), chat_game)], source="chat")
+
+      with open(path, "rb") as f:
+        archive = f.read()
+      for game_id in index.games_through("X........", limit=1000):
+        game = index.game(game_id)
+        cells = [row * 3 + col for row, col in game["moves"]]
+        assert game["source"] == os.path.abspath(path)
+        assert cells == games[game_id - 1]
+        record = encode_game(cells)
+        assert archive[game["offset"]:game["offset"] + len(record)] == record
+
+      game = index.game(len(games) + 1)
+      assert game["moves"] == [(1, 1), (0, 0), (2, 2)]
+      assert game["source"] == "chat" and game["offset"] is None and not game["game_over"]
+      assert index.game(len(games) + 2) is None
+    finally:
+      index.close()
+
+def test_parse_board_errors():
+  assert parse_board("x...O....").tolist() == [[1, 0, 0, 0, 2, 0, 0, 0, 0]]
+  for board in ("X..Q.....", "X..", [["X", " "], [" "]]):
+    try:
+      parse_board(board)
+    except ValueError:
+      pass
+    else:
+      raise AssertionError(f"{board!r} should be rejected")
+
+if __name__ == "__main__":
+  run_tests(globals(), "position index")
@@ -0,0 +1,110 @@
+import io
+import os
+import random
+import tempfile
+from records import (
+  FILE_HEADER, OUTCOME_DRAW, OUTCOME_UNFINISHED, OUTCOME_X,
+  GameRecordReader, GameRecordWriter, encode_game, export_games, import_games, read_games, replay
+)
+from test_helpers import random_game, run_tests
+
+def read_raw(data, chunk_size=7):
+  return list(GameRecordReader(io.BytesIO(data), chunk_size=chunk_size).iter_raw())
+
+def test_round_trip():
+  """Games written with GameRecordWriter read back unchanged, across chunk boundaries"""
+  rng = random.Random(0)
+  games = [random_game(rng) for _ in range(2000)]
+  buf = io.BytesIO()
+  writer = GameRecordWriter(buf)
+  for game in games:
+    writer.write_cells(game)
+  assert writer.count == len(games)
+
+  raw = read_raw(buf.getvalue())
+  assert [list(cells) for _, cells in raw] == games
+  assert [outcome for outcome, _ in raw] == [replay(game) for game in games]
+
+def test_outcomes():
+  x_wins = [0, 3, 1, 4, 2]
+  draw = [0, 1, 2, 4, 3, 5, 7, 6, 8]
+  data = FILE_HEADER + encode_game(x_wins) + encode_game(draw) + encode_game([4])
+  games = list(GameRecordReader(io.BytesIO(data)))
+  assert [g["winner"] for g in games] == ["X", None, None]
+  assert [g["game_over"] for g in games] == [True, True, False]
+  assert games[0]["moves"] == [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+  assert [o for o, _ in read_raw(data)] == [OUTCOME_X, OUTCOME_DRAW, OUTCOME_UNFINISHED]
+
+def test_append():
+  """Appending to an archive does not write a second header"""
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    with GameRecordWriter.open(path) as writer:
+      writer.write_cells([4, 0])
+    with GameRecordWriter.open(path, append=True) as writer:
+      writer.write_cells([0, 3, 1, 4, 2])
+    with open(path, "rb") as f:
+      data = f.read()
+    assert data.count(FILE_HEADER) == 1
+    assert [g["moves"] for g in read_games(path)] == [[(1, 1), (0, 0)], [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]]
+
+def test_append_rejects_other_files():
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "games.tttr")
+    with open(path, "wb") as f:
+      f.write(b"not a record file")
+    try:
+      GameRecordWriter.open(path, append=True)
+    except ValueError:
+      pass
+    else:
+      raise AssertionError("appending to a non-record file should fail")
+
+def test_corrupt_header_mid_stream():
+  """A second file header inside the stream is reported, not decoded as a game"""
+  data = FILE_HEADER + encode_game([4, 0]) + FILE_HEADER + encode_game([1])
+  try:
+    read_raw(data)
+  except ValueError as e:
+    assert "Corrupt" in str(e)
+  else:
+    raise AssertionError("corrupt record should raise")
+
+def test_move_off_board():
+  data = FILE_HEADER + bytes([0x02, 4, 9])
+  try:
+    read_raw(data)
+  except ValueError as e:
+    assert "off the board" in str(e)
+  else:
+    raise AssertionError("move off the board should raise")
+
+def test_truncated():
+  data = FILE_HEADER + encode_game([0, 3, 1, 4, 2])[:-1]
+  try:
+    read_raw(data)
+  except ValueError as e:
+    assert "Truncated" in str(e)
+  else:
+    raise AssertionError("truncated file should raise")
+
+def test_bad_magic():
+  try:
+    GameRecordReader(io.BytesIO(b"JSON{}"))
+  except ValueError:
+    pass
+  else:
+    raise AssertionError("bad magic should raise")
+
+def test_json_import_export():
+  """test_inputs.json -> binary -> request JSONL -> binary gives identical bytes"""
+  with tempfile.TemporaryDirectory() as tmp:
+    first, requests, second = (os.path.join(tmp, name) for name in ("a.tttr", "r.jsonl", "b.tttr"))
+    assert import_games("test_inputs.json", first) == (2, 0)
+    assert export_games(first, requests, requests=True) == 2
+    assert import_games(requests, second) == (2, 0)
+    with open(first, "rb") as a, open(second, "rb") as b:
+      assert a.read() == b.read()
+
+if __name__ == "__main__":
+  run_tests(globals(), "game records")
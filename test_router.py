@@ -0,0 +1,197 @@
+import asyncio
+import json
+from mcp.types import TextContent
+from main import TicTacToe
+import router as router_module
+from router import HashRing, Router
+from test_helpers import run_tests
+
+class FakeWorker:
+  """In-process stand-in for a main.py --worker process"""
+
+  def __init__(self, name, fail_on_load=False, **kwargs):
+    self.name = name
+    self.fail_on_load = fail_on_load
+    self.games = {}
+    self.running = False
+
+  async def start(self):
+    self.running = True
+    return True
+
+  async def stop(self):
+    self.running = False
+
+  async def call_tool(self, tool_name, args):
+    game_id = args["game_id"]
+    if tool_name == "export_game":
+      game = self.games.get(game_id)
+      return [TextContent(type="text", text=json.dumps({"state": game and game.get_state()}))]
+    if tool_name == "drop_game":
+      return [TextContent(type="text", text=json.dumps(self.games.pop(game_id, None) is not None))]
+    if tool_name in ("get_state", "show_board"):
+      # Reads never create a game, like main.peek_game
+      game = self.games.get(game_id, TicTacToe())
+    else:
+      game = self.games.setdefault(game_id, TicTacToe())
+    if tool_name == "play_move":
+      game.play_move(args["input"]["row"], args["input"]["col"])
+    elif tool_name == "load_game":
+      if self.fail_on_load:
+        raise RuntimeError(f"Worker {self.name} failed to run load_game")
+      game.load_state(args["state"])
+    return [TextContent(type="text", text=json.dumps(game.get_state()))]
+
+def make_router(*workers):
+  router = Router()
+  router._started = True
+  for worker in workers:
+    router.workers[worker.name] = worker
+    router.ring.add(worker.name)
+  return router
+
+async def play_games(router, count):
+  for n in range(count):
+    await router.call("play_move", {"input": {"row": n % 3, "col": 0}}, f"game-{n}")
+
+def test_hash_ring_placement():
+  """Placement is deterministic and spreads games over every node"""
+  ring = HashRing(["a", "b", "c"])
+  game_ids = [f"game-{n}" for n in range(3000)]
+  owners = [ring.get(game_id) for game_id in game_ids]
+  assert owners == [HashRing(["c", "a", "b"]).get(game_id) for game_id in game_ids]
+  for node in "abc":
+    assert 600 < owners.count(node) < 1400
+
+def test_hash_ring_moves_few_games():
+  """Adding a node only moves games onto it; removing one only moves its games"""
+  ring = HashRing(["a", "b", "c"])
+  bigger = ring.copy()
+  bigger.add("d")
+  game_ids = [f"game-{n}" for n in range(3000)]
+  moved = [game_id for game_id in game_ids if ring.get(game_id) != bigger.get(game_id)]
+  assert all(bigger.get(game_id) == "d" for game_id in moved)
+  assert 0.15 < len(moved) / len(game_ids) < 0.35
+
+  smaller = ring.copy()
+  smaller.remove("a")
+  for game_id in game_ids:
+    if ring.get(game_id) != "a":
+      assert smaller.get(game_id) == ring.get(game_id)
+
+def test_migration_moves_state():
+  """Moved games keep their state on the new owner and are dropped from the old one"""
+  a, b, c = FakeWorker("a"), FakeWorker("b"), FakeWorker("c")
+  router = make_router(a, b)
+
+  async def run():
+    await play_games(router, 40)
+    before = {game_id: router.ring.get(game_id) for game_id in router.games}
+    new_ring = router.ring.copy()
+    new_ring.add("c")
+    router.workers["c"] = c
+    moved = await router._migrate(new_ring)
+    return before, moved
+
+  before, moved = asyncio.run(run())
+  assert moved == len(c.games) > 0
+  for game_id in router.games:
+    owner = router.workers[router.ring.get(game_id)]
+    assert game_id in owner.games
+    assert sum(game_id in worker.games for worker in (a, b, c)) == 1
+    if before[game_id] != owner.name:
+      assert owner.name == "c"
+      n = int(game_id.split("-")[1])
+      assert owner.games[game_id].board[n % 3][0] == "X"
+
+def test_migration_failure_keeps_old_ring():
+  """If a copy fails, partial copies are dropped and games stay where they were"""
+  a, b = FakeWorker("a"), FakeWorker("b", fail_on_load=True)
+  router = make_router(a)
+
+  async def run():
+    await play_games(router, 20)
+    old_ring = router.ring
+    new_ring = router.ring.copy()
+    new_ring.add("b")
+    router.workers["b"] = b
+    try:
+      await router._migrate(new_ring)
+    except RuntimeError:
+      pass
+    else:
+      raise AssertionError("migration should have failed")
+    return old_ring
+
+  old_ring = asyncio.run(run())
+  assert router.ring is old_ring
+  assert b.games == {}
+  assert set(a.games) == router.games
+  assert not router._migrating
+
+def test_only_changed_games_are_tracked():
+  """Reads on unknown ids are not tracked, and router locks are freed after each call"""
+  router = make_router(FakeWorker("a"))
+
+  async def run():
+    await router.call("get_state", {}, "never-played")
+    await router.call("show_board", {}, "never-played")
+    await router.call("reset_game", {}, "played")
+
+  asyncio.run(run())
+  assert router.games == {"played"}
+  assert router.game_locks == {} and router._lock_users == {}
+
+def test_migration_forgets_evicted_games():
+  """Games a worker has evicted are forgotten on rebalance instead of being recreated"""
+  a, b = FakeWorker("a"), FakeWorker("b")
+  router = make_router(a)
+
+  async def run():
+    await play_games(router, 20)
+    a.games.clear()  # the worker evicted every idle game
+    new_ring = router.ring.copy()
+    new_ring.add("b")
+    router.workers["b"] = b
+    return await router._migrate(new_ring)
+
+  assert asyncio.run(run()) == 0
+  assert b.games == {}
+  # The ids that would have moved to b are forgotten; the rest wait for a later rebalance
+  assert 0 < len(router.games) < 20
+  assert all(router.ring.get(game_id) == "a" for game_id in router.games)
+
+def test_failed_start_is_undone():
+  """If a worker fails to start, the ones started before it are stopped and removed"""
+  started = []
+
+  class FlakyWorker(FakeWorker):
+    async def start(self):
+      if len(started) == 2:
+        return False
+      started.append(self)
+      return await super().start()
+
+  original = router_module.Worker
+  router_module.Worker = FlakyWorker
+  try:
+    router = Router(worker_count=3)
+    try:
+      asyncio.run(router.start())
+    except RuntimeError:
+      pass
+    else:
+      raise AssertionError("start should have failed")
+  finally:
+    router_module.Worker = original
+  assert router.workers == {} and not router._started
+  assert not any(worker.running for worker in started)
+  try:
+    router.ring.get("game-0")
+  except LookupError:
+    pass
+  else:
+    raise AssertionError("the ring should be empty")
+
+if __name__ == "__main__":
+  run_tests(globals(), "router")
@@ -0,0 +1,132 @@
+import asyncio
+from contextlib import asynccontextmanager
+from mcp.shared.memory import create_connected_server_and_client_session
+import main
+from client import ClientPool, MCPClient
+from test_helpers import run_tests
+
+main.enable_worker_tools()  # ClientPool.release calls drop_game, as on the pool's own servers
+
+@asynccontextmanager
+async def connect(game_id):
+  """MCPClient for game_id talking to main.py's server over in-memory streams"""
+  client = MCPClient(game_id=game_id)
+  async with create_connected_server_and_client_session(
+    main.mcp._mcp_server, message_handler=client._handle_message
+  ) as session:
+    client.session = session
+    yield client
+
+def no_subscribers():
+  return not main.subscriptions and not main.session_uris and not main.outboxes
+
+async def next_update(updates):
+  return await asyncio.wait_for(anext(updates), 5)
+
+def test_push_arrives_before_tool_result():
+  """A subscriber's pushed state is current as soon as its own tool call returns"""
+  async def run():
+    async with connect("push") as client:
+      assert await client.subscribe()
+      await client.reset_game()
+      for row, col in [(0, 0), (1, 1), (0, 1)]:
+        await client.play_move(row, col)
+        assert client.latest_state()["board"][row][col] != " "
+      assert client.latest_state()["current_player"] == "O"
+
+  asyncio.run(run())
+  assert no_subscribers()
+
+def test_updates_follow_other_players():
+  """updates() yields every change made by another session, then ends on unsubscribe"""
+  async def run():
+    async with connect("watched") as watcher, connect("watched") as player:
+      updates = watcher.updates()
+      first = asyncio.create_task(next_update(updates))
+      while not main.subscriptions:
+        await asyncio.sleep(0.01)
+      await player.reset_game()
+      await first
+      await player.play_move(1, 1)
+      assert (await next_update(updates))["board"][1][1] == "X"
+
+      ending = asyncio.create_task(next_update(updates))
+      assert await watcher.unsubscribe()
+      try:
+        await ending
+      except StopAsyncIteration:
+        pass
+      else:
+        raise AssertionError("updates() should end after unsubscribe")
+      assert watcher.latest_state() is None
+      assert no_subscribers()
+
+  asyncio.run(run())
+
+def test_full_outbox_drops_and_tells_subscriber():
+  """A subscriber that falls behind is told it was unsubscribed and falls back to get_state"""
+  async def run():
+    size = main.OUTBOX_SIZE
+    main.OUTBOX_SIZE = 3
+    try:
+      async with connect("slow") as client:
+        await client.reset_game()
+        updates = client.updates()
+        ending = asyncio.create_task(anext(updates))
+        while not main.subscriptions:
+          await asyncio.sleep(0.01)
+        # Changes queued without yielding to the sender overflow the outbox
+        for _ in range(main.OUTBOX_SIZE + 1):
+          main.notify_game_changed("slow")
+        assert no_subscribers()
+        try:
+          await asyncio.wait_for(ending, 5)
+        except StopAsyncIteration:
+          pass
+        else:
+          raise AssertionError("updates() should end when the server drops the subscription")
+        assert client.latest_state() is None
+    finally:
+      main.OUTBOX_SIZE = size
+
+  asyncio.run(run())
+
+def test_session_close_drops_subscriptions():
+  """A session that disconnects without unsubscribing leaves nothing behind, even for evicted games"""
+  async def run():
+    async with connect("closing") as client:
+      await client.reset_game()
+      assert await client.subscribe()
+      main.forget_game("closing")
+      assert not no_subscribers()
+
+  asyncio.run(run())
+  assert no_subscribers()
+
+def test_pool_release_clears_pushed_state():
+  """Releasing a pooled game unsubscribes it and ends its updates()"""
+  async def run():
+    async with connect("pooled") as client:
+      pool = ClientPool()
+      pool.clients.append(client)
+      pool.active[client] = pool.served[client] = 1
+      game = client.bind("pooled")
+      updates = game.updates()
+      ending = asyncio.create_task(anext(updates))
+      while not main.subscriptions:
+        await asyncio.sleep(0.01)
+      await pool.release(game)
+      try:
+        await asyncio.wait_for(ending, 5)
+      except StopAsyncIteration:
+        pass
+      else:
+        raise AssertionError("updates() should end on release")
+      assert game.states == {} and not game._listeners
+      assert pool.active[client] == 0
+      assert no_subscribers()
+
+  asyncio.run(run())
+
+if __name__ == "__main__":
+  run_tests(globals(), "state subscriptions")